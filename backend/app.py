@@ -1,64 +1,93 @@
-from flask import Flask
+from flask import Flask, Response, request
 from flask_socketio import SocketIO, emit
 import base64
 import cv2
+import functools
 import numpy as np
 import os
-import tensorflow as tf
+import time
 from modules.navigator import Navigator
-
-# --- Object Detector Class ---
-class ObjectDetector:
-    def __init__(self, model_filename='ssd_mobilenet_v2.tflite', label_filename='coco_labels.txt'):
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(base_dir, 'models', model_filename)
-        label_path = os.path.join(base_dir, 'models', label_filename)
-        self.CALIBRATED_FOCAL_LENGTH = 600
-        self.KNOWN_WIDTHS = {"person": 0.5, "car": 1.8, "bicycle": 0.6, "bottle": 0.07}
-        self.interpreter = tf.lite.Interpreter(model_path=model_path)
-        self.interpreter.allocate_tensors()
-        self.input_details = self.interpreter.get_input_details()
-        self.output_details = self.interpreter.get_output_details()
-        _, self.height, self.width, _ = self.input_details[0]['shape']
-        with open(label_path, 'r') as f:
-            self.labels = [line.strip() for line in f.readlines()]
-        print("✅ Object Detector Initialized.")
-
-    def detect(self, image_frame):
-        image_height, image_width, _ = image_frame.shape
-        input_image = cv2.resize(image_frame, (self.width, self.height))
-        input_data = np.expand_dims(input_image, axis=0)
-        self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
-        self.interpreter.invoke()
-        boxes = self.interpreter.get_tensor(self.output_details[0]['index'])[0]
-        classes = self.interpreter.get_tensor(self.output_details[1]['index'])[0]
-        scores = self.interpreter.get_tensor(self.output_details[2]['index'])[0]
-        detections = []
-        for i in range(len(scores)):
-            if scores[i] > 0.5 and int(classes[i]) < len(self.labels) and self.labels[int(classes[i])] in self.KNOWN_WIDTHS:
-                object_name = self.labels[int(classes[i])]
-                ymin, xmin, ymax, xmax = boxes[i]
-                
-                ### MODIFIED ### - Calculate the horizontal center of the object
-                # xmax and xmin are proportions (0.0 to 1.0) of the image width.
-                center_x = (xmin + xmax) / 2.0
-                
-                object_pixel_width = int((xmax - xmin) * image_width)
-                distance = (self.KNOWN_WIDTHS[object_name] * self.CALIBRATED_FOCAL_LENGTH) / object_pixel_width
-                
-                ### MODIFIED ### - Add the position to the returned data
-                detections.append({'name': object_name, 'distance': float(distance), 'position_x': float(center_x)})
-                
-        return detections
+from modules.object_detection import ObjectDetector
+from modules.landmark_recognizer import LandmarkRecognizer
+from modules.landmark_matcher import EmbeddingLandmarkRecognizer
+from modules.metrics import Metrics
+from modules.message_queue import LocalQueueManager
+from modules.quality_control import QualityController
+from modules.scheduler import PriorityScheduler, DeadlineExceeded
+from modules.frame_gate import FrameChangeGate
+from modules.session_recorder import SessionRecorder
 
 # --- SETUP AND INITIALIZATION ---
+# Set VA_TRACE_FILE to also write a sampled fraction of events as JSON traces.
+TRACE_FILE = os.environ.get('VA_TRACE_FILE')
+TRACE_SAMPLE_RATE = float(os.environ.get('VA_TRACE_SAMPLE_RATE', '0.01'))
+# Obstacle detection only looks at the walking corridor in front of the user:
+# x0,y0,x1,y1 as fractions of the frame. Set VA_OBSTACLE_ROI=full to use the whole frame.
+OBSTACLE_ROI_SETTING = os.environ.get('VA_OBSTACLE_ROI', '0.2,0.3,0.8,1.0')
+OBSTACLE_ROI = None if OBSTACLE_ROI_SETTING == 'full' else tuple(float(v) for v in OBSTACLE_ROI_SETTING.split(','))
+# Multi-worker mode (see serve.py): each worker gets its own port and joins the
+# shared local message queue so emits reach clients connected to other workers.
+PORT = int(os.environ.get('VA_PORT', '5000'))
+MESSAGE_QUEUE = os.environ.get('VA_MESSAGE_QUEUE')
+# Compiled copy of map.geojson that workers load instead of parsing it (Navigator.compile).
+COMPILED_MAP_PATH = os.environ.get('VA_COMPILED_MAP')
+# Set by serve.py so each worker can keep its own files apart from the others'.
+WORKER_ID = os.environ.get('VA_WORKER_ID')
+# Set VA_RECORD_DIR to record every incoming event for offline replay (see replay_session.py).
+RECORD_DIR = os.environ.get('VA_RECORD_DIR')
+# Force a Socket.IO async mode (threading, eventlet, gevent); by default the best installed one is used.
+ASYNC_MODE = os.environ.get('VA_ASYNC_MODE') or None
+
 app = Flask(__name__)
-socketio = SocketIO(app, cors_allowed_origins="*")
-object_detector = ObjectDetector()
-navigator = Navigator(map_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'map.geojson'))
+if MESSAGE_QUEUE:
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE, client_manager=LocalQueueManager(MESSAGE_QUEUE))
+else:
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE)
+metrics = Metrics(trace_path=TRACE_FILE, trace_sample_rate=TRACE_SAMPLE_RATE)
+object_detector = ObjectDetector(metrics=metrics)
+navigator = Navigator(
+    map_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'map.geojson'),
+    compiled_path=COMPILED_MAP_PATH
+)
 print("✅ Navigator Initialized.")
+landmark_recognizer = LandmarkRecognizer(
+    model_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'model.tflite'),
+    labels_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'labels.txt')
+)
+landmark_recognizer.log_unmapped_labels(navigator)
+# The enrolment-based recognizer is optional: it needs a backbone exported with
+# `train_model.py --export-backbone` copied into backend/models.
+backbone_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'backbone.tflite')
+embedding_recognizer = None
+if os.path.exists(backbone_path):
+    embedding_recognizer = EmbeddingLandmarkRecognizer(
+        backbone_path,
+        index_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'enrolled_landmarks.npz')
+    )
+# Per-client state for fused localization, keyed by Socket.IO session id.
+localization_sessions = {}
+# Per-client frame-difference gates for the obstacle stream.
+obstacle_gates = {}
+# Tells each client which resolution, JPEG quality and frame rate to capture at.
+quality_controller = QualityController()
+# All model inference goes through one priority queue: obstacle frames first,
+# then landmark confirmation, then scene descriptions. The TFLite interpreters
+# are not thread-safe, so there is a single worker by default.
+scheduler = PriorityScheduler(socketio, workers=int(os.environ.get('VA_INFERENCE_WORKERS', '1')), metrics=metrics)
+scheduler.start()
+if WORKER_ID is not None:
+    print(f"✅ Worker {WORKER_ID} serving on port {PORT}.")
+session_recorder = None
+if RECORD_DIR:
+    # Blob offsets are only valid within one process's files, so under serve.py
+    # every worker records into its own subdirectory.
+    record_path = os.path.join(RECORD_DIR, f'worker-{WORKER_ID}') if WORKER_ID is not None else RECORD_DIR
+    session_recorder = SessionRecorder(record_path)
 
 
+# Objects closer than this (in meters) trigger an obstacle alert during navigation.
+OBSTACLE_ALERT_DISTANCE = 3.0
+
 ### MODIFIED ### - New helper function to get a direction label
 def get_position_label(x_coordinate):
     """
@@ -76,6 +105,8 @@ def generate_summary(objects):
     """
     Turns a list of objects (which now include position) into a human-like sentence.
     """
+    # Objects whose distance couldn't be estimated (inf) would be read out as "inf meters".
+    objects = [obj for obj in objects if np.isfinite(obj['distance'])]
     if not objects:
         return "The path ahead looks clear."
 
@@ -99,6 +130,23 @@ def generate_summary(objects):
 
     return summary
 
+def generate_obstacle_alert(objects):
+    """
+    Turns detections into a short warning about the closest nearby obstacle,
+    or "Path is clear." if nothing is within OBSTACLE_ALERT_DISTANCE.
+    """
+    nearby = [obj for obj in objects if obj['distance'] <= OBSTACLE_ALERT_DISTANCE]
+    if not nearby:
+        return "Path is clear."
+    closest_obj = min(nearby, key=lambda x: x['distance'])
+    position_text = get_position_label(closest_obj['position_x'])
+    return f"Careful, {closest_obj['name']} {position_text}, {closest_obj['distance']:.1f} meters away."
+
+def client_device(data):
+    """The camera identifier sent with a frame, if it's a usable string."""
+    device = data.get('device')
+    return device if isinstance(device, str) and device else None
+
 def decode_image_from_data_url(data_url):
     """Decodes a Base64 image data URL into an OpenCV image."""
     encoded_data = data_url.split(',')[1]
@@ -106,38 +154,250 @@ def decode_image_from_data_url(data_url):
     img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
     return img
 
+# --- INFERENCE JOBS (run by the scheduler) ---
+def analyze_frame(data_url, device=None):
+    """Decodes a frame and runs object detection on it."""
+    with metrics.timer('decode'):
+        image_frame = decode_image_from_data_url(data_url)
+    return object_detector.detect(image_frame, device=device)
+
+def analyze_obstacle_frame(data_url, gate, device=None):
+    """
+    Obstacle-stream version of analyze_frame: crops to the walking corridor and
+    skips the detector entirely if the corridor hasn't changed since the last frame.
+    """
+    with metrics.timer('decode'):
+        image_frame = decode_image_from_data_url(data_url)
+    with metrics.timer('gate'):
+        if OBSTACLE_ROI is not None:
+            height, width, _ = image_frame.shape
+            x0, y0, x1, y1 = OBSTACLE_ROI
+            corridor = image_frame[int(y0 * height):int(y1 * height), int(x0 * width):int(x1 * width)]
+        else:
+            corridor = image_frame
+        cached = gate.cached_result(corridor)
+    metrics.record_cache('obstacle_frame_gate', cached is not None)
+    if cached is not None:
+        return cached
+    detections = object_detector.detect(image_frame, roi=OBSTACLE_ROI, device=device)
+    gate.store(detections)
+    return detections
+
+def recognize_landmark(data, session):
+    """Decodes a frame and recognizes the landmark, using GPS if the client sent it."""
+    latitude = data.get('latitude')
+    longitude = data.get('longitude')
+    accuracy = data.get('accuracy')
+    if not isinstance(accuracy, (int, float)):
+        accuracy = None
+    use_embedding = data.get('mode') == 'embedding' and embedding_recognizer is not None
+    fused = not use_embedding and latitude is not None and longitude is not None
+    if fused:
+        # A reusable result skips decoding as well as inference.
+        cached = landmark_recognizer.cached_result(latitude, longitude, accuracy, session)
+        metrics.record_cache('landmark_localization', cached is not None)
+        if cached is not None:
+            return cached
+
+    with metrics.timer('decode'):
+        image_frame = decode_image_from_data_url(data['image'])
+    with metrics.timer('landmark'):
+        if use_embedding:
+            return embedding_recognizer.predict_landmark(image_frame)
+        if not fused:
+            return landmark_recognizer.predict_landmark(image_frame)
+        return landmark_recognizer.predict_landmark_at(
+            image_frame, latitude, longitude, navigator,
+            accuracy_meters=accuracy, session=session
+        )
+
+def enroll_landmark(name, images):
+    """Decodes the enrolment frames and adds them to the embedding index."""
+    frames = [decode_image_from_data_url(image) for image in images]
+    return embedding_recognizer.enroll(name, frames)
+
+# --- HTTP ROUTES ---
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus-style metrics for every pipeline stage."""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 # --- SOCKETIO EVENTS ---
+def recorded(handler):
+    """Records the incoming event and its payload before handling it, if VA_RECORD_DIR is set."""
+    @functools.wraps(handler)
+    def wrapper(data=None):
+        if session_recorder is not None:
+            session_recorder.record(request.sid, request.event['message'], data)
+        return handler(data)
+    return wrapper
+
 @socketio.on('connect')
 def handle_connect():
     print('✅ Client connected')
+    emit('quality_settings', quality_controller.settings_for(request.sid))
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    localization_sessions.pop(request.sid, None)
+    obstacle_gates.pop(request.sid, None)
+    quality_controller.forget(request.sid)
+
+def report_frame_processed(started_at, hazard=False):
+    """Feeds the frame's processing time to the quality controller and sends any new settings."""
+    update = quality_controller.end(request.sid, time.perf_counter() - started_at, hazard=hazard)
+    if update:
+        emit('quality_settings', update)
 
 @socketio.on('describe_scene')
+@recorded
 def handle_describe_scene(json_data):
     """
     The main event handler, now uses the smarter generate_summary function.
     """
-    print("Received 'describe_scene' request.")
-    try:
-        image_frame = decode_image_from_data_url(json_data['image'])
-        detected_objects = object_detector.detect(image_frame)
-        summary_text = generate_summary(detected_objects)
-        
-        emit('scene_summary', {'summary': summary_text})
-        print(f"Sent summary: {summary_text}")
-    except Exception as e:
-        print(f"An error occurred in describe_scene: {e}")
-        emit('scene_summary', {'summary': 'Sorry, an error occurred while analyzing the scene.'})
+    with metrics.track_event('describe_scene'):
+        quality_controller.begin()
+        started_at = time.perf_counter()
+        try:
+            detected_objects = scheduler.run('scene', analyze_frame, json_data['image'], client_device(json_data))
+            with metrics.timer('summary'):
+                summary_text = generate_summary(detected_objects)
+
+            with metrics.timer('emit'):
+                emit('scene_summary', {'summary': summary_text})
+        except DeadlineExceeded:
+            emit('scene_summary', {'summary': "I'm a little busy right now. Please tap again in a moment."})
+        except Exception as e:
+            metrics.inc('va_errors_total', event='describe_scene')
+            print(f"An error occurred in describe_scene: {e}")
+            emit('scene_summary', {'summary': 'Sorry, an error occurred while analyzing the scene.'})
+        report_frame_processed(started_at)
+
+@socketio.on('process_frame_for_obstacles')
+@recorded
+def handle_process_frame_for_obstacles(data):
+    """
+    Obstacle stream used while navigating. Always asks the client for the next
+    frame, so the capture loop keeps going even if this one failed.
+    """
+    with metrics.track_event('process_frame_for_obstacles'):
+        quality_controller.begin()
+        started_at = time.perf_counter()
+        hazard = False
+        try:
+            gate = obstacle_gates.setdefault(request.sid, FrameChangeGate())
+            detected_objects = scheduler.run('obstacle', analyze_obstacle_frame, data['image_data'], gate, client_device(data))
+            with metrics.timer('summary'):
+                message = generate_obstacle_alert(detected_objects)
+            hazard = message != "Path is clear."
+            with metrics.timer('emit'):
+                emit('obstacle_alert', {'message': message})
+        except DeadlineExceeded:
+            # The frame went stale in the queue; a fresh one is more useful.
+            pass
+        except Exception as e:
+            metrics.inc('va_errors_total', event='process_frame_for_obstacles')
+            print(f"An error occurred in process_frame_for_obstacles: {e}")
+        report_frame_processed(started_at, hazard=hazard)
+        emit('request_next_frame')
 
 # --- Your previous event handlers are still here, just in case ---
 @socketio.on('get_navigation')
+@recorded
 def handle_get_navigation(data):
-    start = data.get('start')
-    end = data.get('end')
-    instructions = navigator.find_shortest_path(start, end)
-    if instructions:
-        emit('navigation_response', {'instructions': instructions})
-    else:
-        emit('navigation_response', {'error': f"Could not find a route from {start} to {end}."})
+    """
+    Route between two landmarks. Instead of 'end', a client may send 'ends' (a list,
+    answered with one route per destination) or 'category' (the nearest landmark of
+    that category, e.g. "restroom").
+    """
+    with metrics.track_event('get_navigation'):
+        data = data if isinstance(data, dict) else {}
+        start = data.get('start')
+        end = data.get('end')
+        ends = data.get('ends')
+        category = data.get('category')
+        if not isinstance(start, str) or not start:
+            emit('navigation_response', {'error': 'Please say where you are starting from.'})
+            return
+        try:
+            if ends is not None:
+                if not isinstance(ends, list) or not all(isinstance(name, str) for name in ends):
+                    emit('navigation_response', {'error': "'ends' must be a list of landmark names."})
+                    return
+                with metrics.timer('route'):
+                    routes = navigator.routes_from(start, ends)
+                emit('navigation_response', {'routes': routes})
+            elif category is not None:
+                if not isinstance(category, str) or not category:
+                    emit('navigation_response', {'error': "'category' must be a landmark category."})
+                    return
+                with metrics.timer('route'):
+                    nearest = navigator.nearest_landmark(start, category)
+                if nearest:
+                    name, distance, instructions = nearest
+                    emit('navigation_response', {'destination': name, 'distance': distance, 'instructions': instructions})
+                else:
+                    emit('navigation_response', {'error': f"Could not find a {category} near {start}."})
+            else:
+                if not isinstance(end, str) or not end:
+                    emit('navigation_response', {'error': 'Please say where you want to go.'})
+                    return
+                with metrics.timer('route'):
+                    instructions = navigator.find_shortest_path(start, end)
+                if instructions:
+                    emit('navigation_response', {'instructions': instructions})
+                else:
+                    emit('navigation_response', {'error': f"Could not find a route from {start} to {end}."})
+        except Exception as e:
+            metrics.inc('va_errors_total', event='get_navigation')
+            print(f"An error occurred in get_navigation: {e}")
+            emit('navigation_response', {'error': 'Sorry, an error occurred while finding the route.'})
+
+@socketio.on('confirm_position')
+@recorded
+def handle_confirm_position(data):
+    """
+    Recognizes the landmark in front of the user. If the client sends its GPS
+    position, only landmarks near that position are considered.
+    """
+    with metrics.track_event('confirm_position'):
+        try:
+            session = localization_sessions.setdefault(request.sid, {})
+            landmark, confidence = scheduler.run('landmark', recognize_landmark, data, session)
+            with metrics.timer('emit'):
+                emit('position_confirmation', {'landmark': landmark, 'confidence': confidence})
+        except DeadlineExceeded:
+            emit('position_confirmation', {'error': "I'm a little busy right now. Please try again."})
+        except Exception as e:
+            metrics.inc('va_errors_total', event='confirm_position')
+            print(f"An error occurred in confirm_position: {e}")
+            emit('position_confirmation', {'error': 'Sorry, I could not recognize this place.'})
+
+@socketio.on('enroll_landmark')
+@recorded
+def handle_enroll_landmark(data):
+    """Enrols a new landmark live from a few camera frames."""
+    with metrics.track_event('enroll_landmark'):
+        if embedding_recognizer is None:
+            emit('enrollment_response', {'error': 'Landmark enrolment is not available on this server.'})
+            return
+        data = data if isinstance(data, dict) else {}
+        name = data.get('name')
+        images = data.get('images')
+        name = name.strip().lower() if isinstance(name, str) else ''
+        if (not name or not isinstance(images, list) or not images
+                or not all(isinstance(image, str) for image in images)):
+            emit('enrollment_response', {'error': 'Please provide a name and at least one image.'})
+            return
+        try:
+            count = scheduler.run('landmark', enroll_landmark, name, images)
+            emit('enrollment_response', {'name': name, 'frames': count})
+        except DeadlineExceeded:
+            emit('enrollment_response', {'error': "I'm a little busy right now. Please try again."})
+        except Exception as e:
+            metrics.inc('va_errors_total', event='enroll_landmark')
+            print(f"An error occurred in enroll_landmark: {e}")
+            emit('enrollment_response', {'error': f"Sorry, I could not remember {name}."})
 
 if __name__ == '__main__':
-    socketio.run(app, host='0.0.0.0', port=5000)
\ No newline at end of file
+    socketio.run(app, host='0.0.0.0', port=PORT)
\ No newline at end of file
@@ -0,0 +1,53 @@
+# backend/modules/frame_gate.py
+
+import time
+import cv2
+import numpy as np
+
+# --- Configuration ---
+# Frames are compared as tiny grayscale thumbnails of this size (width, height).
+THUMBNAIL_SIZE = (32, 24)
+# Mean absolute gray-level difference (0-255) above which the scene counts as changed.
+CHANGE_THRESHOLD = 6.0
+# Even in an unchanged scene, run the detector at least this often (seconds).
+MAX_REUSE_SECONDS = 2.0
+
+class FrameChangeGate:
+    """
+    Cheap frame-difference check for one client's obstacle stream.
+    If the scene has barely changed since the last detection, the previous
+    result can be reused and the detector skipped entirely.
+    """
+    def __init__(self):
+        # Thumbnail of the frame the stored result was detected on.
+        self._thumbnail = None
+        self._pending_thumbnail = None
+        self._result = None
+        self._result_time = 0.0
+
+    def _make_thumbnail(self, image_frame):
+        small = cv2.resize(image_frame, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY).astype(np.int16)
+
+    def cached_result(self, image_frame):
+        """
+        Returns the previous detections if the frame is unchanged, otherwise None.
+        Frames are compared with the frame the stored detections were made on, not
+        the previous frame, so slow changes (an obstacle approaching gradually)
+        still add up and trigger a new detection.
+        """
+        thumbnail = self._make_thumbnail(image_frame)
+        self._pending_thumbnail = thumbnail
+        if self._thumbnail is None or self._result is None:
+            return None
+        if time.monotonic() - self._result_time > MAX_REUSE_SECONDS:
+            return None
+        if float(np.abs(thumbnail - self._thumbnail).mean()) > CHANGE_THRESHOLD:
+            return None
+        return self._result
+
+    def store(self, result):
+        """Stores detections for the frame last passed to cached_result()."""
+        self._thumbnail = self._pending_thumbnail
+        self._result = result
+        self._result_time = time.monotonic()
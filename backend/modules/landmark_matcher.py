@@ -0,0 +1,223 @@
+# backend/modules/landmark_matcher.py
+
+import json
+import os
+import tensorflow as tf
+import numpy as np
+import cv2
+
+try:
+    import fcntl # Not available on Windows
+except ImportError:
+    fcntl = None
+
+# Below this cosine similarity a frame is not considered a match for any landmark.
+MIN_SIMILARITY = 0.6
+
+class EmbeddingIndex:
+    """
+    In-memory vector index of enrolled landmarks.
+
+    Each landmark is stored as one prototype: the normalized mean of its unit-length
+    embeddings. A lookup is a single matrix-vector product over all prototypes, which
+    stays well under a millisecond for thousands of landmarks. Anything with the same
+    add/search interface (e.g. an approximate index) can be swapped in later.
+    """
+    def __init__(self, dimension, initial_capacity=64):
+        self.dimension = dimension
+        self.labels = []
+        self._rows = {}
+        self._sums = np.zeros((initial_capacity, dimension), dtype=np.float32)
+        self._prototypes = np.zeros((initial_capacity, dimension), dtype=np.float32)
+        self._counts = np.zeros(initial_capacity, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def _grow(self):
+        capacity = self._sums.shape[0] * 2
+        for name in ('_sums', '_prototypes'):
+            grown = np.zeros((capacity, self.dimension), dtype=np.float32)
+            grown[:len(self.labels)] = getattr(self, name)[:len(self.labels)]
+            setattr(self, name, grown)
+        counts = np.zeros(capacity, dtype=np.int64)
+        counts[:len(self.labels)] = self._counts[:len(self.labels)]
+        self._counts = counts
+
+    def add(self, label, embeddings):
+        """Adds unit-length embeddings (N x dimension) to a landmark, creating it if new."""
+        embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        row = self._rows.get(label)
+        if row is None:
+            if len(self.labels) == self._sums.shape[0]:
+                self._grow()
+            row = len(self.labels)
+            self._rows[label] = row
+            self.labels.append(label)
+
+        self._sums[row] += embeddings.sum(axis=0)
+        self._counts[row] += embeddings.shape[0]
+        norm = np.linalg.norm(self._sums[row])
+        self._prototypes[row] = self._sums[row] / norm if norm > 0 else 0.0
+
+    def remove(self, label):
+        """Forgets a landmark. The last row is moved into its slot."""
+        row = self._rows.pop(label, None)
+        if row is None:
+            return False
+        last = len(self.labels) - 1
+        if row != last:
+            moved_label = self.labels[last]
+            self._sums[row] = self._sums[last]
+            self._prototypes[row] = self._prototypes[last]
+            self._counts[row] = self._counts[last]
+            self.labels[row] = moved_label
+            self._rows[moved_label] = row
+        self.labels.pop()
+        self._sums[last] = 0.0
+        self._prototypes[last] = 0.0
+        self._counts[last] = 0
+        return True
+
+    def search(self, query, k=1):
+        """Returns up to k (label, cosine similarity) pairs, best first."""
+        count = len(self.labels)
+        if count == 0:
+            return []
+        similarities = self._prototypes[:count] @ np.asarray(query, dtype=np.float32)
+        k = min(k, count)
+        if k < count:
+            top = np.argpartition(-similarities, k - 1)[:k]
+        else:
+            top = np.arange(count)
+        top = top[np.argsort(-similarities[top])]
+        return [(self.labels[i], float(similarities[i])) for i in top]
+
+    def save(self, path):
+        count = len(self.labels)
+        # Labels as a plain string array, so loading never needs pickle.
+        np.savez(path, labels=np.array(self.labels, dtype=str), sums=self._sums[:count], counts=self._counts[:count])
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path, allow_pickle=False)
+        sums = data['sums']
+        index = cls(sums.shape[1], initial_capacity=max(64, sums.shape[0]))
+        for label, row_sum, count in zip(data['labels'], sums, data['counts']):
+            row = len(index.labels)
+            index._rows[str(label)] = row
+            index.labels.append(str(label))
+            index._sums[row] = row_sum
+            index._counts[row] = count
+            norm = np.linalg.norm(row_sum)
+            index._prototypes[row] = row_sum / norm if norm > 0 else 0.0
+        return index
+
+
+class EmbeddingLandmarkRecognizer:
+    def __init__(self, backbone_path, index_path=None):
+        """
+        Recognizes landmarks by nearest-neighbour search over backbone embeddings.
+        New landmarks can be enrolled at runtime from a few frames, no retraining needed.
+
+        `backbone_path` is the feature extractor exported by `train_model.py --export-backbone`.
+        If `index_path` is given, enrolments are loaded from and saved to that .npz file.
+        Several worker processes can share the file: updates are made under a file
+        lock, and each worker reloads the index when another one has changed it.
+        """
+        self.interpreter = tf.lite.Interpreter(model_path=backbone_path)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()
+        self.output_details = self.interpreter.get_output_details()
+        _, self.height, self.width, _ = self.input_details[0]['shape']
+        dimension = int(self.output_details[0]['shape'][-1])
+
+        # The exported backbone includes its own Rescaling layer and expects 0-255 pixels.
+        self.pixel_max = 255.0
+        info_path = os.path.splitext(backbone_path)[0] + '.json'
+        if os.path.exists(info_path):
+            with open(info_path, 'r') as f:
+                self.pixel_max = float(json.load(f).get('pixel_range', [0, 255])[1])
+
+        self.index_path = index_path
+        self.index = EmbeddingIndex(dimension)
+        self._index_stamp = None
+        self._reload_if_changed()
+
+        print(f"✅ Embedding Landmark Recognizer initialized with {len(self.index)} enrolled landmarks.")
+
+    def embed(self, image_frame):
+        """Returns the unit-length embedding of one OpenCV (BGR) frame."""
+        input_image = cv2.resize(image_frame, (self.width, self.height))
+        # The backbone was trained on RGB images.
+        input_image = cv2.cvtColor(input_image, cv2.COLOR_BGR2RGB)
+        input_image = np.asarray(input_image, dtype=np.float32) * (self.pixel_max / 255.0)
+        input_data = np.expand_dims(input_image, axis=0)
+
+        self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
+        self.interpreter.invoke()
+        embedding = self.interpreter.get_tensor(self.output_details[0]['index'])[0].astype(np.float32)
+
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    # --- Shared index file ---
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.index_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _reload_if_changed(self):
+        """Picks up enrolments saved by other workers since the index was last loaded."""
+        if not self.index_path:
+            return
+        stamp = self._file_stamp()
+        if stamp is not None and stamp != self._index_stamp:
+            self.index = EmbeddingIndex.load(self.index_path)
+            self._index_stamp = stamp
+
+    def _update_index(self, change):
+        """
+        Applies change(index) and saves the result. With a shared file this happens
+        under an exclusive lock on the latest saved index, so concurrent enrolments
+        on different workers don't overwrite each other.
+        """
+        if not self.index_path:
+            return change(self.index)
+        with open(self.index_path + '.lock', 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._reload_if_changed()
+            result = change(self.index)
+            # Written to a temporary file and renamed, so readers never see a partial file.
+            temp_path = f"{os.path.splitext(self.index_path)[0]}.{os.getpid()}.tmp.npz"
+            self.index.save(temp_path)
+            os.replace(temp_path, self.index_path)
+            self._index_stamp = self._file_stamp()
+        return result
+
+    def enroll(self, name, image_frames):
+        """Adds a landmark (or more views of an existing one) from a few frames."""
+        embeddings = np.stack([self.embed(frame) for frame in image_frames])
+        self._update_index(lambda index: index.add(name, embeddings))
+        return len(embeddings)
+
+    def forget(self, name):
+        return self._update_index(lambda index: index.remove(name))
+
+    def predict_landmark(self, image_frame):
+        """
+        Takes a single image frame (from OpenCV) and returns (landmark, similarity).
+        The landmark is None if nothing enrolled is similar enough.
+        """
+        self._reload_if_changed()
+        matches = self.index.search(self.embed(image_frame), k=1)
+        if not matches:
+            return (None, 0.0)
+        landmark, similarity = matches[0]
+        if similarity < MIN_SIMILARITY:
+            return (None, similarity)
+        return (landmark, similarity)
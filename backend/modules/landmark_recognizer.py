@@ -1,8 +1,31 @@
 # backend/modules/landmark_recognizer.py (FINAL CORRECTED VERSION)
 
+import json
+import os
+import time
 import tensorflow as tf
 import numpy as np
 import cv2
+from .navigator import haversine_meters
+
+# --- Fused localization settings ---
+# Landmarks further than this from the reported position are treated as out of range.
+CANDIDATE_RADIUS_METERS = 150
+# A poor fix widens the radius up to its accuracy, but beyond this (e.g. IP-based
+# browser positions, tens of km) the position says nothing useful about which
+# landmark is in view, so the frame is recognized on its own.
+MAX_CANDIDATE_RADIUS_METERS = 2000
+# Score multiplier for out-of-range landmarks. 0.0 restricts the argmax to nearby
+# landmarks, a small positive value only down-weights them.
+OUT_OF_RANGE_WEIGHT = 0.0
+# A GPS fix at least this accurate is trusted enough to skip inference...
+HIGH_CONFIDENCE_ACCURACY_METERS = 10
+# ...as long as the user has moved less than this since the last recognized frame,
+# the fix that frame was recognized at was just as accurate...
+STATIONARY_THRESHOLD_METERS = 5
+# ...and the result is no older than this. Standing still, the user may turn to
+# face another landmark, so a reused result has to be refreshed regularly.
+MAX_RESULT_AGE_SECONDS = 3.0
 
 class LandmarkRecognizer:
     def __init__(self, model_path, labels_path):
@@ -19,9 +42,34 @@ class LandmarkRecognizer:
         self.input_details = self.interpreter.get_input_details()
         self.output_details = self.interpreter.get_output_details()
         
+        # Navigator landmark names are lowercase; keep the matching key for each label.
+        self._label_keys = [label.lower() for label in self.labels]
+
         # Get the expected input size from the model
         _, self.height, self.width, _ = self.input_details[0]['shape']
 
+        # Full-integer models (train_model.py --quantize int8/uint8) take quantized
+        # pixels directly, so most of the per-frame float normalization goes away.
+        self.input_dtype = self.input_details[0]['dtype']
+        self.input_scale, self.input_zero_point = self.input_details[0]['quantization']
+        self.output_scale, self.output_zero_point = self.output_details[0]['quantization']
+        self.integer_input = np.issubdtype(self.input_dtype, np.integer)
+        # uint8 with scale 1 / zero point 0 means quantized values are the raw pixels.
+        self.raw_pixel_input = (self.input_dtype == np.uint8 and self.input_zero_point == 0
+                                and abs(self.input_scale - 1.0) < 1e-6)
+
+        # Models exported by train_model.py describe their expected pixel range in a
+        # sidecar next to the model (model.tflite -> model.json). It is required:
+        # guessing wrong would silently scale every frame twice, or not at all.
+        info_path = os.path.splitext(model_path)[0] + '.json'
+        if not os.path.exists(info_path):
+            raise FileNotFoundError(
+                f"Model description '{info_path}' not found. Copy the .json written by "
+                f"train_model.py next to the model together with the .tflite file."
+            )
+        with open(info_path, 'r') as f:
+            self.pixel_max = float(json.load(f)['pixel_range'][1])
+
         print(f"✅ Landmark Recognizer initialized. Expecting {self.height}x{self.width} images.")
         print(f"   Labels loaded: {self.labels}")
 
@@ -30,17 +78,24 @@ class LandmarkRecognizer:
         with open(path, 'r') as f:
             return [line.strip() for line in f.readlines()]
 
-    def predict_landmark(self, image_frame):
-        """
-        Takes a single image frame (from OpenCV) and returns the predicted landmark.
-        """
+    def _predict_scores(self, image_frame):
+        """Runs the model on one frame and returns the raw class scores."""
         # 1. Pre-process the image to match the model's input requirements
         # Resize the image
         input_image = cv2.resize(image_frame, (self.width, self.height))
         
-        # Convert the image to FLOAT32 and normalize pixel values to be between 0 and 1.
-        # This is the crucial step that fixes the data type mismatch.
-        input_image = np.asarray(input_image, dtype=np.float32) / 255.0
+        if self.raw_pixel_input:
+            # The quantized input is the pixel itself: no conversion needed.
+            pass
+        elif self.integer_input:
+            limits = np.iinfo(self.input_dtype)
+            pixels = np.asarray(input_image, dtype=np.float32) * (self.pixel_max / 255.0)
+            input_image = np.clip(np.round(pixels / self.input_scale + self.input_zero_point),
+                                  limits.min, limits.max).astype(self.input_dtype)
+        else:
+            # Convert the image to FLOAT32 and scale pixel values to the model's range.
+            # This is the crucial step that fixes the data type mismatch.
+            input_image = np.asarray(input_image, dtype=np.float32) * (self.pixel_max / 255.0)
         
         # Add a batch dimension because the model expects a list of images
         input_data = np.expand_dims(input_image, axis=0)
@@ -54,10 +109,81 @@ class LandmarkRecognizer:
         # 4. Get the results
         output_data = self.interpreter.get_tensor(self.output_details[0]['index'])
         scores = output_data[0]
+        if np.issubdtype(scores.dtype, np.integer):
+            # Dequantize so confidences stay comparable with the float model.
+            scores = (scores.astype(np.float32) - self.output_zero_point) * self.output_scale
+        return scores
+
+    def predict_landmark(self, image_frame):
+        """
+        Takes a single image frame (from OpenCV) and returns the predicted landmark.
+        """
+        scores = self._predict_scores(image_frame)
         
-        # 5. Find the best prediction
+        # Find the best prediction
         predicted_index = np.argmax(scores)
         predicted_landmark = self.labels[predicted_index]
         confidence = float(scores[predicted_index])
         
-        return (predicted_landmark, confidence)
\ No newline at end of file
+        return (predicted_landmark, confidence)
+
+    def predict_landmark_at(self, image_frame, latitude, longitude, navigator, accuracy_meters=None, session=None):
+        """
+        Fused localization: combines the camera frame with an approximate GPS position.
+
+        Only landmarks that the navigator map places near the position are considered.
+        Labels the map doesn't know at all can't be placed, so they always stay in.
+
+        `session` is a dict owned by the caller (one per client) that remembers the
+        last fix and result between calls. Call `cached_result()` first: when the fix
+        is accurate and the user has not moved, the previous result can be reused
+        without decoding the frame or running the model. Returns (landmark, confidence).
+        """
+        if session is None:
+            session = {}
+
+        radius = CANDIDATE_RADIUS_METERS
+        if accuracy_meters is not None:
+            radius = max(radius, accuracy_meters)
+        if radius > MAX_CANDIDATE_RADIUS_METERS:
+            return self.predict_landmark(image_frame)
+        nearby = navigator.landmarks_within(latitude, longitude, radius)
+
+        scores = np.asarray(self._predict_scores(image_frame), dtype=np.float32)
+        weights = np.array([
+            1.0 if key in nearby or key not in navigator.landmarks else OUT_OF_RANGE_WEIGHT
+            for key in self._label_keys
+        ], dtype=np.float32)
+        weighted = scores * weights
+        total = float(weighted.sum())
+        if total > 0:
+            # Re-normalize so the confidence is a probability over the candidates.
+            scores = weighted / total
+
+        predicted_index = int(np.argmax(scores))
+        result = (self.labels[predicted_index], float(scores[predicted_index]))
+
+        session['last_fix'] = (latitude, longitude, accuracy_meters)
+        session['last_result'] = result
+        session['last_time'] = time.monotonic()
+        return result
+
+    def log_unmapped_labels(self, navigator):
+        """Warns about labels with no landmark of the same name on the map; GPS can't filter those."""
+        unmapped = [label for label, key in zip(self.labels, self._label_keys) if key not in navigator.landmarks]
+        if unmapped:
+            print(f"⚠️ Landmark labels not on the map (never filtered by position): {unmapped}")
+
+    def cached_result(self, latitude, longitude, accuracy_meters, session):
+        """
+        Returns the session's previous result if it can be reused for this fix,
+        otherwise None. Cheap enough to call before decoding the frame at all.
+        """
+        last_fix = session.get('last_fix')
+        if (last_fix is None
+                or accuracy_meters is None or accuracy_meters > HIGH_CONFIDENCE_ACCURACY_METERS
+                or last_fix[2] is None or last_fix[2] > HIGH_CONFIDENCE_ACCURACY_METERS
+                or time.monotonic() - session['last_time'] > MAX_RESULT_AGE_SECONDS
+                or haversine_meters(longitude, latitude, last_fix[1], last_fix[0]) > STATIONARY_THRESHOLD_METERS):
+            return None
+        return session['last_result']
\ No newline at end of file
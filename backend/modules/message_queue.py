@@ -0,0 +1,162 @@
+# backend/modules/message_queue.py
+#
+# A local stand-in for Redis/Kombu so several server processes on one machine can
+# share Socket.IO rooms and emits. The broker is a tiny TCP fan-out: every message
+# a worker publishes is relayed to every subscribed worker (including itself).
+
+import json
+import socket
+import struct
+import threading
+from urllib.parse import urlparse
+
+import socketio
+
+DEFAULT_QUEUE_URL = 'local://127.0.0.1:5099'
+# The first byte a worker sends says what the connection is used for.
+ROLE_PUBLISHER = b'P'
+ROLE_SUBSCRIBER = b'S'
+_HEADER = struct.Struct('>I')
+
+def parse_queue_url(url):
+    parsed = urlparse(url)
+    if parsed.scheme != 'local':
+        raise ValueError(f"Unsupported message queue URL '{url}', expected local://host:port")
+    return parsed.hostname or '127.0.0.1', parsed.port or 5099
+
+def _recv_exactly(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("message queue connection closed")
+        data += chunk
+    return data
+
+def send_frame(sock, payload):
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+def recv_frame(sock):
+    (size,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return _recv_exactly(sock, size)
+
+# --- Broker ---
+
+class MessageBroker:
+    """Relays frames from publishers to all subscribers. Runs in the launcher process."""
+    def __init__(self, url=DEFAULT_QUEUE_URL):
+        self.address = parse_queue_url(url)
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        self._server = socket.create_server(self.address)
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        print(f"✅ Message broker listening on {self.address[0]}:{self.address[1]}")
+
+    def stop(self):
+        if self._server:
+            self._server.close()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return # Server socket closed
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            role = _recv_exactly(conn, 1)
+            if role == ROLE_SUBSCRIBER:
+                with self._lock:
+                    self._subscribers.append(conn)
+                # Subscribers never send anything; just wait for them to go away.
+                while conn.recv(1024):
+                    pass
+            else:
+                while True:
+                    self._broadcast(recv_frame(conn))
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self._lock:
+                if conn in self._subscribers:
+                    self._subscribers.remove(conn)
+            conn.close()
+
+    def _broadcast(self, payload):
+        with self._lock:
+            for subscriber in list(self._subscribers):
+                try:
+                    send_frame(subscriber, payload)
+                except OSError:
+                    self._subscribers.remove(subscriber)
+
+# --- Socket.IO client manager ---
+
+class LocalQueueManager(socketio.PubSubManager):
+    """
+    Socket.IO client manager that uses the local broker, in the same way
+    socketio.RedisManager uses Redis. Pass it as `client_manager` to SocketIO.
+    """
+    name = 'local'
+
+    def __init__(self, url=DEFAULT_QUEUE_URL, channel='socketio', write_only=False, logger=None):
+        self.address = parse_queue_url(url)
+        self._publisher = None
+        self._publish_lock = None
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+
+    def _async_primitives(self):
+        """Socket module and lock class that cooperate with the server's async mode."""
+        async_mode = getattr(self.server, 'async_mode', 'threading')
+        if async_mode == 'gevent':
+            from gevent import socket as async_socket
+            from gevent.lock import Semaphore
+            return async_socket, Semaphore
+        if async_mode == 'eventlet':
+            from eventlet.green import socket as async_socket
+            from eventlet.semaphore import Semaphore
+            return async_socket, Semaphore
+        return socket, threading.Lock
+
+    def _connect(self, role):
+        async_socket, _ = self._async_primitives()
+        sock = async_socket.create_connection(self.address)
+        sock.sendall(role)
+        return sock
+
+    def _publish(self, data):
+        if self._publish_lock is None:
+            self._publish_lock = self._async_primitives()[1]()
+        # JSON, like socketio.RedisManager: PubSubManager only accepts dicts or JSON text.
+        payload = json.dumps(data).encode('utf-8')
+        with self._publish_lock:
+            try:
+                if self._publisher is None:
+                    self._publisher = self._connect(ROLE_PUBLISHER)
+                send_frame(self._publisher, payload)
+            except OSError:
+                # Reconnect once, e.g. after the broker restarted.
+                self._publisher = self._connect(ROLE_PUBLISHER)
+                send_frame(self._publisher, payload)
+
+    def _listen(self):
+        retry_sleep = 1
+        while True:
+            subscriber = None
+            try:
+                subscriber = self._connect(ROLE_SUBSCRIBER)
+                retry_sleep = 1
+                while True:
+                    yield json.loads(recv_frame(subscriber))
+            except OSError as e:
+                self._get_logger().error(f"Message queue connection lost ({e}), retrying in {retry_sleep}s")
+                self.server.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 30)
+            finally:
+                if subscriber is not None:
+                    subscriber.close()
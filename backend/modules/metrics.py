@@ -0,0 +1,153 @@
+# backend/modules/metrics.py
+
+import contextvars
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram buckets for latencies, in seconds.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# The trace of the event currently being handled (one per greenlet/thread).
+_current_trace = contextvars.ContextVar('current_trace', default=None)
+
+class Metrics:
+    """
+    Small, dependency-free metrics registry.
+
+    Counters, gauges and latency histograms are rendered in the Prometheus text
+    format by `render_prometheus()`. A sampled fraction of events can also be
+    written as one-line JSON traces with the time spent in every stage.
+    """
+    def __init__(self, trace_path=None, trace_sample_rate=0.0):
+        self._lock = threading.Lock()
+        self._descriptions = {}
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._trace_path = trace_path
+        self._trace_sample_rate = trace_sample_rate if trace_path else 0.0
+
+        self.describe('va_stage_seconds', 'histogram', 'Time spent in each pipeline stage.')
+        self.describe('va_event_seconds', 'histogram', 'End-to-end handling time per Socket.IO event.')
+        self.describe('va_events_total', 'counter', 'Socket.IO events received.')
+        self.describe('va_errors_total', 'counter', 'Socket.IO events that failed.')
+        self.describe('va_inflight_requests', 'gauge', 'Events currently being handled.')
+        self.describe('va_cache_requests_total', 'counter', 'Cache lookups by cache and result (hit/miss).')
+        self.describe('va_queue_depth', 'gauge', 'Inference jobs waiting in the priority scheduler.')
+        self.describe('va_queue_wait_seconds', 'histogram', 'Time inference jobs spent queued, by work class.')
+        self.describe('va_shed_total', 'counter', 'Inference jobs dropped after their deadline, by work class.')
+
+    def describe(self, name, metric_type, help_text):
+        self._descriptions[name] = (metric_type, help_text)
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    def inc(self, name, amount=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def add_gauge(self, name, amount, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def record_cache(self, cache, hit):
+        self.inc('va_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+    @contextmanager
+    def timer(self, stage):
+        """Times a block as one pipeline stage, and adds it to the current trace."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe('va_stage_seconds', elapsed, stage=stage)
+            trace = _current_trace.get()
+            if trace is not None:
+                trace['stages'].append((stage, round(elapsed * 1000, 3)))
+
+    @contextmanager
+    def track_event(self, event):
+        """Wraps the handling of one Socket.IO event: count, in-flight gauge, latency, trace."""
+        self.inc('va_events_total', event=event)
+        self.add_gauge('va_inflight_requests', 1, event=event)
+        trace = None
+        if self._trace_sample_rate and random.random() < self._trace_sample_rate:
+            trace = {'event': event, 'time': time.time(), 'stages': []}
+        token = _current_trace.set(trace)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc('va_errors_total', event=event)
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_trace.reset(token)
+            self.add_gauge('va_inflight_requests', -1, event=event)
+            self.observe('va_event_seconds', elapsed, event=event)
+            if trace is not None:
+                trace['total_ms'] = round(elapsed * 1000, 3)
+                self._write_trace(trace)
+
+    def _write_trace(self, trace):
+        line = json.dumps(trace)
+        with self._lock:
+            with open(self._trace_path, 'a') as f:
+                f.write(line + '\n')
+
+    def render_prometheus(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        def format_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            histograms = {key: (list(h[0]), h[1], h[2]) for key, h in self._histograms.items()}
+
+        lines = []
+        for name, (metric_type, help_text) in self._descriptions.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            if metric_type == 'histogram':
+                for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                        lines.append(f'{name}_bucket{format_labels(labels, [("le", bound)])} {bucket_count}')
+                    lines.append(f'{name}_bucket{format_labels(labels, [("le", "+Inf")])} {count}')
+                    lines.append(f'{name}_sum{format_labels(labels)} {total}')
+                    lines.append(f'{name}_count{format_labels(labels)} {count}')
+            else:
+                values = counters if metric_type == 'counter' else gauges
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f'{name}{format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
@@ -1,12 +1,52 @@
+import heapq
+import itertools
+import json
+import math
+import os
 import geojson
+import numpy as np
 import networkx as nx
 from geopy.distance import geodesic
 
+# Size of one spatial-index cell in degrees (~110 m of latitude).
+# Radius queries only look at the cells the search circle overlaps.
+GRID_CELL_DEGREES = 0.001
+EARTH_RADIUS_METERS = 6371000
+
+def haversine_meters(lon1, lat1, lon2, lat2):
+    """Fast great-circle distance in meters, good enough for radius filtering."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lon2 - lon1)
+    a = math.sin(delta_phi / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2)**2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(a))
+
 class Navigator:
-    def __init__(self, map_path):
+    def __init__(self, map_path, compiled_path=None):
+        """
+        Loads the walking graph from a GeoJSON map. If `compiled_path` points to an
+        up-to-date compiled map (see `compile()`), it is loaded from there instead,
+        which skips GeoJSON parsing and the per-edge geodesic calculations.
+        """
         self.graph = nx.Graph()
         self.landmarks = {}
-        self._load_map(map_path)
+        # Optional landmark categories ("restroom", "exit", ...) from the Point's
+        # "category" property, for nearest_landmark().
+        self.landmark_categories = {}
+        self._landmark_grid = {}
+        if compiled_path and self._is_compiled_fresh(map_path, compiled_path):
+            self._load_compiled(compiled_path)
+        else:
+            self._load_map(map_path)
+        self._build_routing_graph()
+
+    def _add_landmark(self, name, coords, category=None):
+        self.landmarks[name] = coords
+        self.graph.add_node(coords, type='landmark', name=name)
+        if category:
+            self.landmark_categories[name] = category
+        self._landmark_grid.setdefault(self._grid_cell(coords[0], coords[1]), []).append(name)
 
     def _load_map(self, map_path):
         try:
@@ -22,8 +62,7 @@ class Navigator:
                 name = properties.get('name', '').lower()
                 if name:
                     coords = tuple(feature['geometry']['coordinates'])
-                    self.landmarks[name] = coords
-                    self.graph.add_node(coords, type='landmark', name=name)
+                    self._add_landmark(name, coords, (properties.get('category') or '').lower())
         
         for feature in data['features']:
             if feature['geometry']['type'] == 'LineString':
@@ -38,11 +77,178 @@ class Navigator:
                     distance = geodesic(start_node[::-1], end_node[::-1]).meters
                     self.graph.add_edge(start_node, end_node, weight=distance)
     
+    # --- Compiled map ---
+    # A compiled map is a directory of plain .npy arrays plus small JSON files, written
+    # once by serve.py. Each worker reads them into its own graph, which is cheap
+    # compared to parsing GeoJSON and computing geodesic edge lengths.
+
+    @staticmethod
+    def _is_compiled_fresh(map_path, compiled_path):
+        landmarks_file = os.path.join(compiled_path, 'landmarks.json')
+        if not os.path.exists(landmarks_file):
+            return False
+        return not os.path.exists(map_path) or os.path.getmtime(landmarks_file) >= os.path.getmtime(map_path)
+
+    def compile(self, compiled_path):
+        """Writes the loaded graph as arrays: node coordinates, edge endpoints and weights."""
+        os.makedirs(compiled_path, exist_ok=True)
+        nodes = list(self.graph.nodes)
+        node_index = {node: i for i, node in enumerate(nodes)}
+        edges = np.array([(node_index[u], node_index[v]) for u, v in self.graph.edges], dtype=np.int32).reshape(-1, 2)
+        weights = np.array([data['weight'] for _, _, data in self.graph.edges(data=True)], dtype=np.float64)
+
+        np.save(os.path.join(compiled_path, 'nodes.npy'), np.array(nodes, dtype=np.float64).reshape(-1, 2))
+        np.save(os.path.join(compiled_path, 'edges.npy'), edges)
+        np.save(os.path.join(compiled_path, 'weights.npy'), weights)
+        with open(os.path.join(compiled_path, 'categories.json'), 'w') as f:
+            json.dump(self.landmark_categories, f)
+        # Written last: its timestamp marks the compiled map as complete and fresh.
+        with open(os.path.join(compiled_path, 'landmarks.json'), 'w') as f:
+            json.dump({name: node_index[coords] for name, coords in self.landmarks.items()}, f)
+
+    def _load_compiled(self, compiled_path):
+        nodes = np.load(os.path.join(compiled_path, 'nodes.npy'), mmap_mode='r')
+        edges = np.load(os.path.join(compiled_path, 'edges.npy'), mmap_mode='r')
+        weights = np.load(os.path.join(compiled_path, 'weights.npy'), mmap_mode='r')
+        with open(os.path.join(compiled_path, 'landmarks.json'), 'r') as f:
+            landmark_nodes = json.load(f)
+        categories = {}
+        categories_file = os.path.join(compiled_path, 'categories.json')
+        if os.path.exists(categories_file):
+            with open(categories_file, 'r') as f:
+                categories = json.load(f)
+
+        coords = [tuple(float(v) for v in node) for node in nodes]
+        self.graph.add_nodes_from(coords)
+        for name, index in landmark_nodes.items():
+            self._add_landmark(name, coords[index], categories.get(name))
+        self.graph.add_weighted_edges_from(
+            (coords[u], coords[v], float(w)) for (u, v), w in zip(edges, weights)
+        )
+
+    # --- Routing graph ---
+    # LineStrings add a node for every polyline vertex, but most of them just
+    # continue a path (degree 2). Routing runs on a contracted copy of the graph
+    # where each such chain is one edge between intersections, dead ends and
+    # landmarks; the edge keeps the chain's vertices to expand the route again.
+
+    def _build_routing_graph(self):
+        keep = {
+            node for node, degree in self.graph.degree()
+            if degree != 2 or self.graph.nodes[node].get('type') == 'landmark'
+        }
+        routing = nx.Graph()
+        routing.add_nodes_from(keep)
+        for start in keep:
+            for neighbor in self.graph[start]:
+                chain = [start, neighbor]
+                weight = self.graph[start][neighbor]['weight']
+                while chain[-1] not in keep:
+                    previous, current = chain[-2], chain[-1]
+                    following = next(n for n in self.graph[current] if n != previous)
+                    weight += self.graph[current][following]['weight']
+                    chain.append(following)
+                end = chain[-1]
+                if end == start:
+                    continue # A loop back to the same node never shortens a route.
+                # Of two parallel chains between the same nodes, keep the shorter.
+                if routing.has_edge(start, end) and routing[start][end]['weight'] <= weight:
+                    continue
+                routing.add_edge(start, end, weight=weight, chain=tuple(chain))
+        self._routing_graph = routing
+
+    def _expand_route(self, route):
+        """Turns a route through the routing graph back into every polyline vertex."""
+        path_coords = [route[0]]
+        for u, v in zip(route, route[1:]):
+            chain = self._routing_graph[u][v]['chain']
+            if chain[0] != u:
+                chain = chain[::-1]
+            path_coords.extend(chain[1:])
+        return path_coords
+
+    def _search(self, source, predecessors):
+        """
+        Dijkstra over the routing graph that yields (node, distance) as each node is
+        settled, nearest first, so callers can stop as soon as they have what they
+        need. Fills `predecessors` with the shortest-path tree found so far.
+        """
+        distances = {source: 0.0}
+        settled = set()
+        counter = itertools.count() # Tie-breaker: coordinates are not always comparable.
+        heap = [(0.0, next(counter), source)]
+        while heap:
+            distance, _, node = heapq.heappop(heap)
+            if node in settled:
+                continue
+            settled.add(node)
+            yield node, distance
+            for neighbor, data in self._routing_graph[node].items():
+                candidate = distance + data['weight']
+                if neighbor not in settled and candidate < distances.get(neighbor, math.inf):
+                    distances[neighbor] = candidate
+                    predecessors[neighbor] = node
+                    heapq.heappush(heap, (candidate, next(counter), neighbor))
+
+    @staticmethod
+    def _route_to(target, predecessors):
+        route = [target]
+        while route[-1] in predecessors:
+            route.append(predecessors[route[-1]])
+        return route[::-1]
+
+    def _grid_cell(self, lon, lat):
+        return (int(math.floor(lon / GRID_CELL_DEGREES)), int(math.floor(lat / GRID_CELL_DEGREES)))
+
+    def landmarks_within(self, latitude, longitude, radius_meters):
+        """
+        Returns {name: distance_in_meters} for every landmark within the radius,
+        using the grid index so only nearby cells are checked.
+        """
+        lat_span = radius_meters / 111320.0
+        lon_span = radius_meters / (111320.0 * max(math.cos(math.radians(latitude)), 1e-6))
+        min_x, min_y = self._grid_cell(longitude - lon_span, latitude - lat_span)
+        max_x, max_y = self._grid_cell(longitude + lon_span, latitude + lat_span)
+
+        if (max_x - min_x + 1) * (max_y - min_y + 1) > len(self.landmarks):
+            # A huge radius covers more cells than there are landmarks: check them all.
+            candidates = self.landmarks
+        else:
+            candidates = [
+                name
+                for cell_x in range(min_x, max_x + 1)
+                for cell_y in range(min_y, max_y + 1)
+                for name in self._landmark_grid.get((cell_x, cell_y), ())
+            ]
+
+        nearby = {}
+        for name in candidates:
+            lon, lat = self.landmarks[name][:2]
+            distance = haversine_meters(longitude, latitude, lon, lat)
+            if distance <= radius_meters:
+                nearby[name] = distance
+        return nearby
+
     def get_path_bearing(self, p1, p2):
         # This is a placeholder for a more advanced function.
         # For now, we will just use directions like "forward".
         return "forward"
 
+    def _instructions(self, path_coords):
+        instructions = []
+        for i in range(len(path_coords) - 1):
+            p1 = path_coords[i]
+            p2 = path_coords[i+1]
+            dist = self.graph[p1][p2]['weight']
+            direction = self.get_path_bearing(p1, p2)
+
+            node_data = self.graph.nodes[p2]
+            if node_data.get('type') == 'landmark':
+                instructions.append(f"Walk {dist:.0f} meters {direction} to reach {node_data['name']}.")
+            else:
+                instructions.append(f"Walk {dist:.0f} meters {direction}.")
+        return instructions
+
     def find_shortest_path(self, start_name, end_name):
         start_name = start_name.lower()
         end_name = end_name.lower()
@@ -51,26 +257,57 @@ class Navigator:
             return None # Or return an error message
         if end_name not in self.landmarks:
             return None
+        if start_name == end_name:
+            return None # No route to walk; routes_from() answers the same.
 
         start_node = self.landmarks[start_name]
         end_node = self.landmarks[end_name]
         
         try:
-            path_coords = nx.dijkstra_path(self.graph, source=start_node, target=end_node, weight='weight')
-            
-            instructions = []
-            for i in range(len(path_coords) - 1):
-                p1 = path_coords[i]
-                p2 = path_coords[i+1]
-                dist = self.graph[p1][p2]['weight']
-                direction = self.get_path_bearing(p1, p2)
-                
-                node_data = self.graph.nodes[p2]
-                if node_data.get('type') == 'landmark':
-                    instructions.append(f"Walk {dist:.0f} meters {direction} to reach {node_data['name']}.")
-                else:
-                    instructions.append(f"Walk {dist:.0f} meters {direction}.")
-            
-            return instructions
+            route = nx.dijkstra_path(self._routing_graph, source=start_node, target=end_node, weight='weight')
+            return self._instructions(self._expand_route(route))
         except (nx.NetworkXNoPath, nx.NodeNotFound):
-            return None
\ No newline at end of file
+            return None
+
+    def routes_from(self, start_name, end_names):
+        """
+        Routes from one landmark to many with a single Dijkstra search, which stops
+        once every destination is reached. Returns {end_name: instructions}, with
+        None for unknown or unreachable destinations and for the start itself, just
+        like find_shortest_path().
+        """
+        start_name = start_name.lower()
+        routes = {name.lower(): None for name in end_names}
+        if start_name not in self.landmarks:
+            return routes
+
+        targets = {}
+        for name in routes:
+            if name in self.landmarks and name != start_name:
+                targets.setdefault(self.landmarks[name], []).append(name)
+        predecessors = {}
+        for node, _ in self._search(self.landmarks[start_name], predecessors):
+            for name in targets.pop(node, ()):
+                routes[name] = self._instructions(self._expand_route(self._route_to(node, predecessors)))
+            if not targets:
+                break
+        return routes
+
+    def nearest_landmark(self, start_name, category):
+        """
+        Finds the closest landmark of a category by walking distance, searching
+        outwards from `start_name` and stopping at the first match. Returns
+        (name, distance_in_meters, instructions), or None if none is reachable.
+        """
+        start_name = start_name.lower()
+        category = category.lower()
+        if start_name not in self.landmarks:
+            return None
+
+        predecessors = {}
+        for node, distance in self._search(self.landmarks[start_name], predecessors):
+            node_data = self.graph.nodes[node]
+            name = node_data.get('name')
+            if name and name != start_name and self.landmark_categories.get(name) == category:
+                return name, distance, self._instructions(self._expand_route(self._route_to(node, predecessors)))
+        return None
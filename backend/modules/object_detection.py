@@ -1,38 +1,138 @@
 # backend/modules/object_detection.py (FINAL VERSION WITH DISTANCE ESTIMATION)
 
 import cv2
+import json
 import numpy as np
 import tensorflow as tf
 import os
+from .metrics import Metrics
 
 # --- CONFIGURATION ---
-# You need to calibrate this value for your specific phone camera.
-# See the calibration instructions in the main response. A typical phone is 500-800.
-CALIBRATED_FOCAL_LENGTH = 600 # Pixels
-
-# Define the approximate real-world widths of objects we care about (in meters)
-KNOWN_WIDTHS = {
-    "person": 0.5,
-    "car": 1.8,
-    "bicycle": 0.6,
-    "motorcycle": 0.8,
-    "bus": 2.5,
-    "truck": 2.6
+# Only detections above this confidence are reported.
+SCORE_THRESHOLD = 0.5
+
+# Camera calibration lives in backend/models/camera_profiles.json:
+#   {
+#     "default": {"focal_length_px": 600},
+#     "profiles": {
+#       "<device>@<width>x<height>": {"focal_length_px": 1050},
+#       "<device>": {"focal_length_px": 520, "reference_width": 640}
+#     }
+#   }
+# A profile is picked by the exact device and resolution first, then by device
+# alone, then the default. If "reference_width" is given, the focal length was
+# measured at that image width and is scaled to the actual frame width.
+# You need to calibrate focal_length_px for your specific phone camera. A typical phone is 500-800.
+DEFAULT_FOCAL_LENGTH = 600 # Pixels
+
+# Approximate real-world (width, height) of COCO objects, in meters. Use None
+# where a dimension varies too much to be useful.
+OBJECT_SIZES = {
+    "person": (0.5, 1.7),
+    "bicycle": (0.6, 1.0),
+    "car": (1.8, 1.5),
+    "motorcycle": (0.8, 1.1),
+    "bus": (2.5, 3.2),
+    "train": (3.0, 3.8),
+    "truck": (2.6, 3.0),
+    "boat": (2.0, None),
+    "traffic light": (0.3, 0.9),
+    "fire hydrant": (0.3, 0.6),
+    "street sign": (0.6, None),
+    "stop sign": (0.75, 0.75),
+    "parking meter": (0.3, 1.4),
+    "bench": (1.5, 0.8),
+    "bird": (0.2, 0.2),
+    "cat": (0.4, 0.3),
+    "dog": (0.6, 0.6),
+    "horse": (2.0, 1.6),
+    "sheep": (1.2, 0.9),
+    "cow": (2.2, 1.5),
+    "elephant": (3.5, 3.0),
+    "bear": (1.5, 1.2),
+    "zebra": (2.2, 1.4),
+    "giraffe": (2.0, 5.0),
+    "backpack": (0.3, 0.45),
+    "umbrella": (1.0, None),
+    "handbag": (0.35, 0.3),
+    "suitcase": (0.45, 0.7),
+    "bottle": (0.07, 0.25),
+    "cup": (0.08, 0.1),
+    "chair": (0.5, 0.9),
+    "couch": (2.0, 0.9),
+    "potted plant": (0.4, 0.6),
+    "bed": (1.6, None),
+    "dining table": (1.5, 0.75),
+    "toilet": (0.4, 0.8),
+    "tv": (1.0, 0.6),
+    "laptop": (0.35, 0.25),
+    "microwave": (0.5, 0.3),
+    "oven": (0.6, 0.9),
+    "sink": (0.6, None),
+    "refrigerator": (0.8, 1.8),
+    "door": (0.9, 2.0),
+    "desk": (1.2, 0.75),
 }
 
-def estimate_distance(pixel_width, real_width, focal_length):
-    """Calculates the distance to an object."""
-    if pixel_width == 0:
-        return float('inf')
-    return (real_width * focal_length) / pixel_width
+class CameraProfiles:
+    """Per-device focal lengths, loaded once and looked up by device and resolution."""
+    def __init__(self, path=None):
+        self.default = {'focal_length_px': DEFAULT_FOCAL_LENGTH}
+        self.profiles = {}
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                data = json.load(f)
+            self.default = data.get('default', self.default)
+            self.profiles = data.get('profiles', {})
+
+    def focal_length(self, device, image_width, image_height):
+        """
+        Focal length in pixels for a frame of this size from this device. Not cached:
+        `device` comes from the client, and two dict lookups cost less than a cache.
+        """
+        profile = self.default
+        if isinstance(device, str) and device:
+            profile = self.profiles.get(f"{device}@{image_width}x{image_height}") or self.profiles.get(device) or self.default
+        focal = float(profile['focal_length_px'])
+        if profile.get('reference_width'):
+            focal *= image_width / float(profile['reference_width'])
+        return focal
+
+def estimate_distances(boxes, real_widths, real_heights, image_width, image_height, focal_length, truncated=None):
+    """
+    Distances (meters) for many boxes at once. `boxes` is an (N, 4) array of
+    normalized [ymin, xmin, ymax, xmax]; real sizes are per-box arrays with NaN
+    where unknown. The height is used when it's known and the box isn't cut off
+    at the top or bottom of the frame, otherwise the width. Returns inf where no
+    estimate is possible (unknown size or a zero-sized box). `truncated` overrides
+    the cut-off check, e.g. when the boxes came from a cropped region.
+    """
+    ymin, xmin, ymax, xmax = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    pixel_widths = (xmax - xmin) * image_width
+    pixel_heights = (ymax - ymin) * image_height
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        from_width = np.where(pixel_widths > 0, real_widths * focal_length / pixel_widths, np.inf)
+        from_height = np.where(pixel_heights > 0, real_heights * focal_length / pixel_heights, np.inf)
+
+    if truncated is None:
+        truncated = (ymin <= 0.01) | (ymax >= 0.99)
+    use_height = ~np.isnan(real_heights) & ~truncated
+    distances = np.where(use_height, from_height, from_width)
+    # Fall back to the height (even if truncated) when there's no usable width.
+    distances = np.where(np.isnan(distances), from_height, distances)
+    return np.where(np.isnan(distances), np.inf, distances)
 
 class ObjectDetector:
-    def __init__(self, model_filename='ssd_mobilenet_v2.tflite', label_filename='coco_labels.txt'):
+    def __init__(self, model_filename='ssd_mobilenet_v2.tflite', label_filename='coco_labels.txt',
+                 profiles_filename='camera_profiles.json', metrics=None):
+        self.metrics = metrics or Metrics()
         module_dir = os.path.dirname(os.path.abspath(__file__))
         backend_dir = os.path.dirname(module_dir)
         model_path = os.path.join(backend_dir, 'models', model_filename)
         label_path = os.path.join(backend_dir, 'models', label_filename)
-        
+        self.camera_profiles = CameraProfiles(os.path.join(backend_dir, 'models', profiles_filename))
+
         self.interpreter = tf.lite.Interpreter(model_path=model_path)
         self.interpreter.allocate_tensors()
         self.input_details = self.interpreter.get_input_details()
@@ -47,40 +147,64 @@ class ObjectDetector:
             print(f"!!! CRITICAL ERROR: Labels file not found at {label_path}")
             self.labels = []
 
-    def detect(self, image_frame):
+        # Real-world sizes indexed by class id, NaN where unknown, so distances
+        # for every box can be computed in one NumPy pass.
+        sizes = [OBJECT_SIZES.get(label, (None, None)) for label in self.labels]
+        self._real_widths = np.array([np.nan if w is None else w for w, _ in sizes], dtype=np.float32)
+        self._real_heights = np.array([np.nan if h is None else h for _, h in sizes], dtype=np.float32)
+        self._has_size = ~np.isnan(self._real_widths) | ~np.isnan(self._real_heights)
+
+    def detect(self, image_frame, roi=None, device=None):
+        """
+        Detects objects in a frame. With `roi` = (x0, y0, x1, y1) as fractions of the
+        frame, only that region is sent to the model, but the returned position_x
+        is still relative to the whole frame. `device` selects the camera profile.
+        """
         image_height, image_width, _ = image_frame.shape
-        input_image = cv2.resize(image_frame, (self.width, self.height))
-        input_data = np.expand_dims(input_image, axis=0)
+        with self.metrics.timer('resize'):
+            if roi is not None:
+                x0, y0, x1, y1 = roi
+                image_frame = image_frame[int(y0 * image_height):int(y1 * image_height),
+                                          int(x0 * image_width):int(x1 * image_width)]
+            input_image = cv2.resize(image_frame, (self.width, self.height))
+            input_data = np.expand_dims(input_image, axis=0)
+
+        with self.metrics.timer('invoke'):
+            self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
+            self.interpreter.invoke()
 
-        self.interpreter.set_tensor(self.input_details[0]['index'], input_data)
-        self.interpreter.invoke()
+        with self.metrics.timer('postprocess'):
+            focal_length = self.camera_profiles.focal_length(device, image_width, image_height)
+            return self._postprocess(image_width, image_height, focal_length, roi)
 
-        boxes = self.interpreter.get_tensor(self.output_details[0]['index'])[0]
-        classes = self.interpreter.get_tensor(self.output_details[1]['index'])[0]
+    def _postprocess(self, image_width, image_height, focal_length, roi=None):
+        boxes = np.array(self.interpreter.get_tensor(self.output_details[0]['index'])[0], dtype=np.float32)
+        classes = self.interpreter.get_tensor(self.output_details[1]['index'])[0].astype(np.int64)
         scores = self.interpreter.get_tensor(self.output_details[2]['index'])[0]
 
-        detections = []
-        for i in range(len(scores)):
-            if scores[i] > 0.5:
-                object_name = self.labels[int(classes[i])]
-                
-                detection = {
-                    'name': object_name,
-                    'confidence': float(scores[i]),
-                }
-
-                # --- NEW DISTANCE LOGIC ---
-                if object_name in KNOWN_WIDTHS:
-                    # De-normalize bounding box coordinates to get pixel values
-                    ymin, xmin, ymax, xmax = boxes[i]
-                    pixel_xmin = int(xmin * image_width)
-                    pixel_xmax = int(xmax * image_width)
-                    object_pixel_width = pixel_xmax - pixel_xmin
-                    
-                    # Estimate the distance
-                    distance = estimate_distance(object_pixel_width, KNOWN_WIDTHS[object_name], CALIBRATED_FOCAL_LENGTH)
-                    detection['distance'] = float(distance) # Add distance to our results
-                
-                detections.append(detection)
-        
-        return detections
\ No newline at end of file
+        # Keep confident detections of classes whose size we know.
+        valid = (classes >= 0) & (classes < len(self.labels))
+        keep = valid & (scores > SCORE_THRESHOLD) & self._has_size[np.where(valid, classes, 0)]
+        boxes, classes, scores = boxes[keep], classes[keep], scores[keep]
+        if len(scores) == 0:
+            return []
+
+        # Boxes touching the edge of what the model saw are cut off vertically.
+        truncated = (boxes[:, 0] <= 0.01) | (boxes[:, 2] >= 0.99)
+        if roi is not None:
+            # Map boxes from crop coordinates back to the full frame.
+            x0, y0, x1, y1 = roi
+            boxes[:, [1, 3]] = x0 + boxes[:, [1, 3]] * (x1 - x0)
+            boxes[:, [0, 2]] = y0 + boxes[:, [0, 2]] * (y1 - y0)
+
+        distances = estimate_distances(
+            boxes, self._real_widths[classes], self._real_heights[classes],
+            image_width, image_height, focal_length, truncated
+        )
+        # xmax and xmin are proportions (0.0 to 1.0) of the image width.
+        centers_x = (boxes[:, 1] + boxes[:, 3]) / 2.0
+
+        return [
+            {'name': self.labels[c], 'confidence': float(s), 'distance': float(d), 'position_x': float(x)}
+            for c, s, d, x in zip(classes, scores, distances, centers_x)
+        ]
@@ -0,0 +1,95 @@
+# backend/modules/quality_control.py
+
+import os
+import threading
+import time
+
+# --- Configuration ---
+# Capture settings the server can ask a client for, from cheapest to richest.
+QUALITY_LEVELS = [
+    {'width': 320, 'jpeg_quality': 0.4, 'fps': 1},
+    {'width': 480, 'jpeg_quality': 0.5, 'fps': 2},
+    {'width': 640, 'jpeg_quality': 0.6, 'fps': 4},
+    {'width': 800, 'jpeg_quality': 0.7, 'fps': 6},
+    {'width': 1280, 'jpeg_quality': 0.8, 'fps': 10},
+]
+DEFAULT_LEVEL = 2
+# Per-client processing latency (seconds, smoothed) above which the client backs off...
+TARGET_LATENCY = 0.25
+# ...and below which, if the server is also idle, it may ramp back up.
+IDLE_LATENCY = 0.10
+# The server counts as overloaded with more requests in flight than this.
+MAX_INFLIGHT = 2 * (os.cpu_count() or 1)
+LATENCY_SMOOTHING = 0.3 # Weight of the newest sample in the moving average
+STEP_DOWN_COOLDOWN = 1.0 # Seconds between two back-offs for one client
+STEP_UP_INTERVAL = 5.0 # Seconds of good behaviour before ramping up one level
+# After a nearby hazard is reported, the client is never backed off below this
+# level for HAZARD_HOLD_SECONDS, so obstacle alerts keep coming quickly.
+HAZARD_MIN_LEVEL = 2
+HAZARD_HOLD_SECONDS = 5.0
+
+class QualityController:
+    """
+    Chooses capture resolution, JPEG quality and frame rate for each client from
+    its measured processing latency and the server's overall load.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._inflight = 0
+
+    def _state(self, sid, now):
+        state = self._clients.get(sid)
+        if state is None:
+            state = self._clients[sid] = {
+                'level': DEFAULT_LEVEL, 'latency': None, 'last_change': now, 'hazard_until': 0.0
+            }
+        return state
+
+    def settings_for(self, sid):
+        """The settings a client should currently use."""
+        with self._lock:
+            return dict(QUALITY_LEVELS[self._state(sid, time.monotonic())['level']])
+
+    def begin(self):
+        """Call when a frame starts processing."""
+        with self._lock:
+            self._inflight += 1
+
+    def end(self, sid, latency, hazard=False):
+        """
+        Call when a frame finished processing. Returns the new settings if the
+        client should change them, otherwise None.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._inflight -= 1
+            state = self._state(sid, now)
+            if state['latency'] is None:
+                state['latency'] = latency
+            else:
+                state['latency'] += LATENCY_SMOOTHING * (latency - state['latency'])
+            if hazard:
+                state['hazard_until'] = now + HAZARD_HOLD_SECONDS
+
+            floor = HAZARD_MIN_LEVEL if now < state['hazard_until'] else 0
+            level = state['level']
+            overloaded = state['latency'] > TARGET_LATENCY or self._inflight > MAX_INFLIGHT
+            idle = state['latency'] < IDLE_LATENCY and self._inflight <= MAX_INFLIGHT // 2
+
+            if level < floor:
+                level = floor
+            elif overloaded and level > floor and now - state['last_change'] >= STEP_DOWN_COOLDOWN:
+                level -= 1
+            elif idle and level < len(QUALITY_LEVELS) - 1 and now - state['last_change'] >= STEP_UP_INTERVAL:
+                level += 1
+
+            if level == state['level']:
+                return None
+            state['level'] = level
+            state['last_change'] = now
+            return dict(QUALITY_LEVELS[level])
+
+    def forget(self, sid):
+        with self._lock:
+            self._clients.pop(sid, None)
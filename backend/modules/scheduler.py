@@ -0,0 +1,128 @@
+# backend/modules/scheduler.py
+
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+
+# --- Configuration ---
+# Work classes, most urgent first: (priority, deadline in seconds).
+# A job still waiting in the queue when its deadline passes is shed, not run:
+# a stale obstacle frame is worth nothing once the next one is on its way.
+WORK_CLASSES = {
+    'obstacle': (0, 0.5),
+    'landmark': (1, 2.0),
+    'scene': (2, 5.0),
+}
+
+class DeadlineExceeded(Exception):
+    """Raised by PriorityScheduler.run() when the job was shed after its deadline."""
+
+def make_offloader(async_mode):
+    """
+    Returns a function that runs fn(*args) on a native OS thread and waits for it
+    without blocking the event loop, for the given Socket.IO async mode.
+
+    Under gevent and eventlet, CPU-bound work run directly in a handler stalls the
+    whole hub: no heartbeats, no other clients. TFLite and OpenCV release the GIL
+    while they work, so a real thread keeps the event loop responsive.
+    """
+    if async_mode == 'gevent':
+        from gevent import get_hub
+        pool = get_hub().threadpool
+        return lambda fn, *args: pool.apply(fn, args)
+    if async_mode == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute
+    # Threading mode: the scheduler's workers are already native threads.
+    return lambda fn, *args: fn(*args)
+
+class PriorityScheduler:
+    """
+    Runs inference jobs one class at a time in priority order: obstacle frames
+    first, then landmark confirmation, then scene descriptions.
+
+    The handler calling `run()` waits until its job is done. The waiting and the
+    worker loops use the Socket.IO server's own primitives, so this works the same
+    under gevent, eventlet and plain threads. The jobs themselves always run on a
+    native thread, so the event loop never blocks on inference.
+    """
+    def __init__(self, socketio, workers=1, metrics=None):
+        self._socketio = socketio
+        self._workers = workers
+        self._metrics = metrics
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = socketio.server.eio.create_event()
+        self._offload = make_offloader(socketio.server.eio.async_mode)
+
+    def start(self):
+        for _ in range(self._workers):
+            self._socketio.start_background_task(self._worker_loop)
+
+    def run(self, work_class, fn, *args):
+        """Queues fn(*args) under a work class, waits for it and returns its result."""
+        priority, deadline = WORK_CLASSES[work_class]
+        now = time.monotonic()
+        job = {
+            'class': work_class,
+            'fn': fn,
+            'args': args,
+            # Run the job in the caller's context so per-event metrics traces follow it.
+            'context': contextvars.copy_context(),
+            'submitted': now,
+            'deadline': now + deadline,
+            'done': self._socketio.server.eio.create_event(),
+            'result': None,
+            'error': None,
+        }
+        with self._lock:
+            heapq.heappush(self._heap, (priority, next(self._counter), job))
+            depth = len(self._heap)
+        self._record_depth(depth)
+        self._wakeup.set()
+
+        job['done'].wait()
+        if job['error'] is not None:
+            raise job['error']
+        return job['result']
+
+    def _record_depth(self, depth):
+        if self._metrics is not None:
+            self._metrics.set_gauge('va_queue_depth', depth)
+
+    def _next_job(self):
+        while True:
+            with self._lock:
+                if self._heap:
+                    job = heapq.heappop(self._heap)[2]
+                    depth = len(self._heap)
+                    break
+                self._wakeup.clear()
+            self._wakeup.wait()
+        self._record_depth(depth)
+        return job
+
+    def _execute(self, job):
+        """Runs one job on a native thread, in the context of the handler that queued it."""
+        return self._offload(job['context'].run, job['fn'], *job['args'])
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            started = time.monotonic()
+            if self._metrics is not None:
+                self._metrics.observe('va_queue_wait_seconds', started - job['submitted'], work_class=job['class'])
+
+            if started > job['deadline']:
+                if self._metrics is not None:
+                    self._metrics.inc('va_shed_total', work_class=job['class'])
+                job['error'] = DeadlineExceeded(f"{job['class']} job waited {started - job['submitted']:.2f}s")
+            else:
+                try:
+                    job['result'] = self._execute(job)
+                except Exception as e:
+                    job['error'] = e
+            job['done'].set()
@@ -0,0 +1,106 @@
+# backend/modules/session_recorder.py
+#
+# Compact, append-only recording of incoming Socket.IO events for offline replay.
+# A session directory holds two files:
+#   events.jsonl - one JSON line per event: time, client sid, event name, payload
+#   blobs.bin    - large payload strings (camera frames as data URLs) back to back;
+#                  the payload refers to them as {"$blob": [offset, length]}
+# Only one process may write to a session directory. With several workers, each
+# records into its own subdirectory, and read_session() merges them by time.
+
+import heapq
+import json
+import mmap
+import os
+import threading
+import time
+
+EVENTS_FILE_NAME = 'events.jsonl'
+BLOBS_FILE_NAME = 'blobs.bin'
+# Strings at least this long are stored in the blob file instead of the index.
+BLOB_MIN_LENGTH = 1024
+
+class SessionRecorder:
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._events = open(os.path.join(directory, EVENTS_FILE_NAME), 'a')
+        self._blobs = open(os.path.join(directory, BLOBS_FILE_NAME), 'ab')
+        print(f"✅ Recording incoming events to '{directory}'")
+
+    def _extract_blobs(self, value):
+        """Replaces long strings with blob references. Call with the lock held."""
+        if isinstance(value, str) and len(value) >= BLOB_MIN_LENGTH:
+            data = value.encode('utf-8')
+            offset = self._blobs.tell()
+            self._blobs.write(data)
+            return {'$blob': [offset, len(data)]}
+        if isinstance(value, dict):
+            return {k: self._extract_blobs(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._extract_blobs(v) for v in value]
+        return value
+
+    def record(self, sid, event, payload):
+        with self._lock:
+            entry = {
+                't': time.time(),
+                'sid': sid,
+                'event': event,
+                'payload': self._extract_blobs(payload),
+            }
+            # Blobs are flushed first so an index line never points past the blob file.
+            self._blobs.flush()
+            self._events.write(json.dumps(entry) + '\n')
+            self._events.flush()
+
+    def close(self):
+        with self._lock:
+            self._blobs.close()
+            self._events.close()
+
+def read_session(directory):
+    """
+    Iterates over the recorded events in time order, with blob references resolved. If the
+    directory holds per-worker subdirectories instead of a recording, their events
+    are merged.
+    """
+    if os.path.exists(os.path.join(directory, EVENTS_FILE_NAME)):
+        return _read_recording(directory)
+    recordings = [
+        os.path.join(directory, name) for name in sorted(os.listdir(directory))
+        if os.path.exists(os.path.join(directory, name, EVENTS_FILE_NAME))
+    ]
+    return heapq.merge(*(_read_recording(path) for path in recordings), key=lambda entry: entry['t'])
+
+def _read_recording(directory):
+    blobs_path = os.path.join(directory, BLOBS_FILE_NAME)
+    blobs = None
+    blobs_file = open(blobs_path, 'rb') if os.path.exists(blobs_path) else None
+    if blobs_file is not None and os.path.getsize(blobs_path) > 0:
+        blobs = mmap.mmap(blobs_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def resolve(value):
+        if isinstance(value, dict):
+            if '$blob' in value and len(value) == 1:
+                offset, length = value['$blob']
+                return blobs[offset:offset + length].decode('utf-8')
+            return {k: resolve(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [resolve(v) for v in value]
+        return value
+
+    try:
+        with open(os.path.join(directory, EVENTS_FILE_NAME), 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                entry['payload'] = resolve(entry['payload'])
+                yield entry
+    finally:
+        if blobs is not None:
+            blobs.close()
+        if blobs_file is not None:
+            blobs_file.close()
@@ -0,0 +1,114 @@
+# backend/serve.py
+#
+# Multi-process deployment on a single host:
+#   python backend/serve.py --workers 4 --port 5000
+#
+# - Starts the local message broker (modules/message_queue.py) so Socket.IO emits
+#   work across workers, with no Redis or other outside service.
+# - Compiles map.geojson once, so workers skip GeoJSON parsing and the geodesic
+#   edge lengths at startup. Each worker still builds its own (small) routing graph.
+#   The TFLite models are loaded by path, which TFLite memory-maps, so the weights
+#   are shared read-only through the page cache instead of copied per worker.
+# - Runs one app.py worker per port and a small TCP proxy on the public port that
+#   hands each new connection to the next worker in turn. A websocket session lives
+#   on one TCP connection, so it stays on its worker; clients must use the websocket
+#   transport (App.js and load_test.py do), since HTTP long-polling needs stickiness.
+
+import argparse
+import asyncio
+import os
+import signal
+import subprocess
+import itertools
+import sys
+
+from modules.message_queue import MessageBroker, DEFAULT_QUEUE_URL
+from modules.navigator import Navigator
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+MAP_PATH = os.path.join(BACKEND_DIR, 'models', 'map.geojson')
+COMPILED_MAP_PATH = os.path.join(BACKEND_DIR, 'models', 'map.compiled')
+
+def start_workers(count, base_port, queue_url):
+    workers = []
+    for worker_id in range(count):
+        env = dict(os.environ)
+        env.update({
+            'VA_PORT': str(base_port + worker_id),
+            'VA_MESSAGE_QUEUE': queue_url,
+            'VA_COMPILED_MAP': COMPILED_MAP_PATH,
+            'VA_WORKER_ID': str(worker_id),
+        })
+        workers.append(subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, 'app.py')], cwd=BACKEND_DIR, env=env))
+        print(f"✅ Worker {worker_id} started on port {base_port + worker_id} (pid {workers[-1].pid})")
+    return workers
+
+async def _pipe(reader, writer):
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        writer.close()
+
+async def run_proxy(host, port, worker_ports):
+    # Round-robin per connection: clients behind one NAT or proxy (or all on
+    # localhost, like load_test.py) are still spread over every worker.
+    next_port = itertools.cycle(worker_ports)
+
+    async def handle(client_reader, client_writer):
+        try:
+            worker_reader, worker_writer = await asyncio.open_connection('127.0.0.1', next(next_port))
+        except OSError:
+            client_writer.close()
+            return
+        await asyncio.gather(_pipe(client_reader, worker_writer), _pipe(worker_reader, client_writer))
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"✅ Proxy listening on {host}:{port} -> workers on ports {worker_ports}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several Vision Assistant workers behind one port.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Number of worker processes (default: CPU count).")
+    parser.add_argument('--host', default='0.0.0.0', help="Public address to listen on.")
+    parser.add_argument('--port', type=int, default=5000, help="Public port clients connect to.")
+    parser.add_argument('--base-port', type=int, default=5100, help="First worker port; workers use consecutive ports.")
+    parser.add_argument('--queue', default=DEFAULT_QUEUE_URL, help="Address for the local message broker.")
+    args = parser.parse_args()
+
+    print("--- Compiling navigation map ---")
+    Navigator(MAP_PATH).compile(COMPILED_MAP_PATH)
+
+    broker = MessageBroker(args.queue)
+    broker.start()
+
+    workers = start_workers(args.workers, args.base_port, args.queue)
+    worker_ports = [args.base_port + i for i in range(args.workers)]
+
+    def shutdown(*_):
+        for worker in workers:
+            worker.terminate()
+        broker.stop()
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    try:
+        asyncio.run(run_proxy(args.host, args.port, worker_ports))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+        broker.stop()
+
+if __name__ == '__main__':
+    main()
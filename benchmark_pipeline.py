@@ -0,0 +1,177 @@
+# benchmark_pipeline.py
+# Offline, headless benchmark of the describe_scene pipeline. No server needed:
+# the backend modules are imported directly and fed a directory of JPEGs.
+
+import argparse
+import base64
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+try:
+    import resource # Not available on Windows
+except ImportError:
+    resource = None
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'backend'))
+
+# --- Configuration ---
+DEFAULT_IMAGE_SOURCES = [os.path.join(PROJECT_ROOT, 'landmark_dataset'), os.path.join(PROJECT_ROOT, 'test_image.jpg')]
+DEFAULT_OUTPUT_FILE = 'benchmark_results.json'
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg')
+
+def collect_images(sources, limit):
+    """Returns a sorted, de-duplicated list of JPEG paths from files and directories."""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+        elif os.path.isfile(source):
+            paths.append(source)
+        else:
+            print(f"Warning: '{source}' not found, skipping.")
+    paths = sorted(set(paths))
+    return paths[:limit] if limit else paths
+
+def to_data_url(path):
+    with open(path, 'rb') as f:
+        return 'data:image/jpeg;base64,' + base64.b64encode(f.read()).decode('ascii')
+
+def current_rss_mb():
+    """Current resident set size of this process in MB (Linux only, else None)."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, since start or the last reset_peak_rss()."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def reset_peak_rss():
+    """
+    Resets the kernel's peak RSS for this process to the current RSS, so the next
+    read_peak_rss_mb() is the peak of what ran in between (Linux only). Returns
+    whether the reset worked.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        return False
+    return True
+
+def read_peak_rss_mb():
+    """Peak resident set size since the last reset_peak_rss(), in MB (Linux only, else None)."""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, IndexError, ValueError):
+        pass
+    return None
+
+def run_stage(name, fn, inputs, warmup):
+    """Times fn(x) for every input and returns (outputs, stats)."""
+    rss_before = current_rss_mb()
+    peak_was_reset = reset_peak_rss()
+    for x in inputs[:warmup]:
+        fn(x)
+
+    outputs = []
+    latencies = []
+    started = time.perf_counter()
+    for x in inputs:
+        t0 = time.perf_counter()
+        outputs.append(fn(x))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - started
+    rss_after = current_rss_mb()
+    stage_peak = read_peak_rss_mb() if peak_was_reset else None
+
+    latencies = np.array(latencies) if latencies else np.zeros(1)
+    stats = {
+        'count': len(inputs),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+        'throughput_per_s': len(inputs) / elapsed if elapsed > 0 else 0.0,
+        # Memory held before and after the stage, including its outputs, and the
+        # highest RSS reached while the stage ran (None where it can't be reset).
+        'rss_before_mb': rss_before,
+        'rss_after_mb': rss_after,
+        'rss_delta_mb': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        'peak_rss_mb': stage_peak,
+    }
+    print(f"  {name:<12} n={stats['count']:<5} p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms  "
+          f"p99 {stats['p99_ms']:7.2f} ms  {stats['throughput_per_s']:8.1f}/s"
+          + (f"  rss {stats['rss_delta_mb']:+.1f} MB" if stats['rss_delta_mb'] is not None else '')
+          + (f"  peak {stage_peak:.1f} MB" if stage_peak is not None else ''))
+    return outputs, stats
+
+def run_benchmark(sources, limit=None, warmup=3, output_file=DEFAULT_OUTPUT_FILE):
+    image_paths = collect_images(sources, limit)
+    if not image_paths:
+        print("Error: No JPEG images found to benchmark.")
+        return None
+
+    print("--- Loading backend ---")
+    baseline_rss = current_rss_mb()
+    import app as server
+    # Taken before the stages reset the kernel's peak counter.
+    load_peak_rss = peak_rss_mb()
+
+    print(f"\n--- Benchmarking {len(image_paths)} images ---")
+    data_urls = [to_data_url(path) for path in image_paths]
+    stages = {}
+
+    frames, stages['decode'] = run_stage('decode', server.decode_image_from_data_url, data_urls, warmup)
+    detections, stages['detect'] = run_stage('detect', server.object_detector.detect, frames, warmup)
+    _, stages['summary'] = run_stage('summary', server.generate_summary, detections, warmup)
+    _, stages['landmark'] = run_stage('landmark', server.landmark_recognizer.predict_landmark, frames, warmup)
+
+    routes = list(itertools.permutations(server.navigator.landmarks, 2))
+    _, stages['navigation'] = run_stage('navigation', lambda route: server.navigator.find_shortest_path(*route), routes, warmup)
+    # The same routes, answered with one search per start landmark.
+    starts = list(server.navigator.landmarks)
+    _, stages['navigation_batch'] = run_stage('nav batch', lambda start: server.navigator.routes_from(start, starts), starts, warmup)
+
+    peaks = [load_peak_rss, peak_rss_mb()] + [stats['peak_rss_mb'] for stats in stages.values()]
+    peaks = [peak for peak in peaks if peak is not None]
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'images': len(image_paths),
+        'warmup': warmup,
+        'baseline_rss_mb': baseline_rss,
+        'load_peak_rss_mb': load_peak_rss,
+        'peak_rss_mb': max(peaks) if peaks else None,
+        'stages': stages,
+    }
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to '{output_file}'.")
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the scene description pipeline offline.")
+    parser.add_argument('sources', nargs='*', default=DEFAULT_IMAGE_SOURCES,
+                        help="JPEG files or directories to replay (default: landmark_dataset and test_image.jpg).")
+    parser.add_argument('--limit', type=int, default=None, help="Only use the first N images.")
+    parser.add_argument('--warmup', type=int, default=3, help="Untimed warm-up calls per stage.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_FILE, help="Where to write the JSON results.")
+    args = parser.parse_args()
+    run_benchmark(args.sources, limit=args.limit, warmup=args.warmup, output_file=args.output)
@@ -1,6 +1,10 @@
+import argparse
 import cv2
+import hashlib
+import json
 import os
 import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 # --- Configuration ---
 # The folder where you stored your recorded landmark videos.
@@ -11,13 +15,107 @@ OUTPUT_DATASET_FOLDER = 'landmark_dataset'
 # A value of 10 means it saves a frame roughly 3 times per second for a 30fps video.
 # Adjust this if you get too many or too few frames.
 FRAME_SKIP = 10
+# Records which videos (and which version of them) have already been extracted,
+# so incremental runs only touch new or changed videos.
+MANIFEST_FILE_NAME = 'manifest.json'
+# Two frames whose perceptual hashes differ in at most this many bits are
+# considered near-identical when de-duplication is enabled (out of 64 bits).
+DEDUPE_MAX_DISTANCE = 4
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi')
+
+# --- Helpers ---
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """Returns the SHA-1 of a file's contents, read in chunks."""
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+def perceptual_hash(frame):
+    """Computes a 64-bit difference hash (dHash) of a frame."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read manifest '{path}' ({e}). Rebuilding everything.")
+        return {}
+
+def save_manifest(path, manifest):
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+# --- Worker ---
+
+def extract_video(video_path, landmark_folder_path, landmark_name, frame_skip, dedupe):
+    """
+    Extracts every `frame_skip`-th frame of one video into its landmark folder.
+    Runs in a worker process. Skipped frames are only grabbed, never decoded.
+    Returns (saved_frame_count, skipped_duplicates).
+    """
+    if os.path.exists(landmark_folder_path):
+        shutil.rmtree(landmark_folder_path)
+    os.makedirs(landmark_folder_path)
+
+    video_capture = cv2.VideoCapture(video_path)
+    if not video_capture.isOpened():
+        raise IOError(f"Could not open video file {video_path}")
+
+    frame_count = 0
+    saved_frame_count = 0
+    skipped_duplicates = 0
+    last_hash = None
+    try:
+        while True:
+            # grab() advances the stream without decoding the frame.
+            if not video_capture.grab():
+                break # End of video
+
+            if frame_count % frame_skip == 0:
+                # Only the frames we keep are decoded.
+                success, frame = video_capture.retrieve()
+                if not success:
+                    break
+
+                if dedupe:
+                    frame_hash = perceptual_hash(frame)
+                    if last_hash is not None and bin(frame_hash ^ last_hash).count('1') <= DEDUPE_MAX_DISTANCE:
+                        skipped_duplicates += 1
+                        frame_count += 1
+                        continue
+                    last_hash = frame_hash
+
+                image_filename = f"{landmark_name}_frame_{saved_frame_count}.jpg"
+                cv2.imwrite(os.path.join(landmark_folder_path, image_filename), frame)
+                saved_frame_count += 1
+
+            frame_count += 1
+    finally:
+        video_capture.release()
+
+    return saved_frame_count, skipped_duplicates
 
 # --- Main Script ---
 
-def extract_frames():
+def extract_frames(full_rebuild=False, workers=None, dedupe=False, frame_skip=FRAME_SKIP):
     """
-    Processes all videos in the source folder, extracts frames, and saves them
-    into a structured dataset folder.
+    Processes the videos in the source folder in parallel, extracts frames, and
+    saves them into a structured dataset folder.
+
+    By default only new or changed videos are processed (tracked by content hash
+    in the manifest). Pass full_rebuild=True to delete the dataset and start fresh.
     """
     print("--- Starting Frame Extraction Process ---")
 
@@ -27,18 +125,18 @@ def extract_frames():
         print("Please make sure you have created it and placed your videos inside.")
         return
 
-    # 2. Create the main output dataset folder
-    # If it already exists, delete it and its contents to start fresh
-    if os.path.exists(OUTPUT_DATASET_FOLDER):
-        print(f"'{OUTPUT_DATASET_FOLDER}' already exists. Deleting it to create a fresh dataset.")
+    # 2. Prepare the output dataset folder
+    if full_rebuild and os.path.exists(OUTPUT_DATASET_FOLDER):
+        print(f"Full rebuild requested. Deleting '{OUTPUT_DATASET_FOLDER}' to create a fresh dataset.")
         shutil.rmtree(OUTPUT_DATASET_FOLDER)
-    
-    os.makedirs(OUTPUT_DATASET_FOLDER)
-    print(f"Successfully created main dataset folder: '{OUTPUT_DATASET_FOLDER}'")
+    os.makedirs(OUTPUT_DATASET_FOLDER, exist_ok=True)
+
+    manifest_path = os.path.join(OUTPUT_DATASET_FOLDER, MANIFEST_FILE_NAME)
+    manifest = load_manifest(manifest_path)
 
     # 3. Get a list of all video files in the source folder
     try:
-        video_files = [f for f in os.listdir(VIDEO_SOURCE_FOLDER) if f.lower().endswith(('.mp4', '.mov', '.avi'))]
+        video_files = [f for f in os.listdir(VIDEO_SOURCE_FOLDER) if f.lower().endswith(VIDEO_EXTENSIONS)]
     except Exception as e:
         print(f"Error reading the video source folder: {e}")
         return
@@ -47,55 +145,76 @@ def extract_frames():
         print(f"Warning: No video files (.mp4, .mov, .avi) found in '{VIDEO_SOURCE_FOLDER}'.")
         return
 
-    # 4. Loop through each video file and process it
+    # Each video is extracted into a folder named after it, so two videos with the same
+    # name (e.g. canteen.mp4 and canteen.mov) would overwrite each other's frames.
+    videos_by_landmark = {}
     for video_filename in video_files:
-        # Get the landmark name from the filename (e.g., "library.mp4" -> "library")
+        landmark_key = os.path.splitext(video_filename)[0].lower()
+        videos_by_landmark.setdefault(landmark_key, []).append(video_filename)
+    duplicates = [sorted(names) for names in videos_by_landmark.values() if len(names) > 1]
+    if duplicates:
+        for names in duplicates:
+            print(f"Error: {', '.join(names)} would be extracted to the same landmark folder.")
+        print("Keep one video per landmark (rename or remove the others) and run again.")
+        return
+
+    # 4. Remove landmarks whose source video has been deleted since the last run
+    for video_filename in list(manifest):
+        if video_filename not in video_files:
+            landmark_name = manifest.pop(video_filename)['landmark']
+            if landmark_name.lower() in videos_by_landmark:
+                # Another video (e.g. a re-encoded copy) now provides this landmark.
+                continue
+            stale_folder = os.path.join(OUTPUT_DATASET_FOLDER, landmark_name)
+            if os.path.exists(stale_folder):
+                shutil.rmtree(stale_folder)
+            print(f"Removed '{landmark_name}' (source video '{video_filename}' is gone).")
+
+    # 5. Work out which videos are new or changed
+    settings = {'frame_skip': frame_skip, 'dedupe': dedupe}
+    pending = {}
+    for video_filename in sorted(video_files):
+        video_path = os.path.join(VIDEO_SOURCE_FOLDER, video_filename)
+        digest = file_hash(video_path)
+        entry = manifest.get(video_filename)
         landmark_name = os.path.splitext(video_filename)[0]
-        
-        # Create a specific subfolder for this landmark's frames
         landmark_folder_path = os.path.join(OUTPUT_DATASET_FOLDER, landmark_name)
-        os.makedirs(landmark_folder_path)
-        
-        print(f"\nProcessing video: '{video_filename}' for landmark: '{landmark_name}'")
+        if (entry and entry.get('sha1') == digest and entry.get('settings') == settings
+                and os.path.isdir(landmark_folder_path)):
+            continue
+        pending[video_filename] = (video_path, landmark_folder_path, landmark_name, digest)
+
+    skipped = len(video_files) - len(pending)
+    if skipped:
+        print(f"Skipping {skipped} unchanged video(s).")
+    if not pending:
+        print("\n--- Dataset is already up to date ---")
+        return
 
-        # Construct the full path to the video file
-        video_path = os.path.join(VIDEO_SOURCE_FOLDER, video_filename)
-        
-        try:
-            # Open the video file
-            video_capture = cv2.VideoCapture(video_path)
-            if not video_capture.isOpened():
-                print(f"  Error: Could not open video file {video_filename}")
-                continue # Skip to the next video
-
-            frame_count = 0
-            saved_frame_count = 0
-
-            # Read frames from the video until it's finished
-            while True:
-                success, frame = video_capture.read()
-                
-                if not success:
-                    break # End of video
-                
-                # Check if this frame should be saved based on the FRAME_SKIP value
-                if frame_count % FRAME_SKIP == 0:
-                    # Construct the output image filename
-                    image_filename = f"{landmark_name}_frame_{saved_frame_count}.jpg"
-                    image_path = os.path.join(landmark_folder_path, image_filename)
-                    
-                    # Save the frame as a JPG file
-                    cv2.imwrite(image_path, frame)
-                    saved_frame_count += 1
-                
-                frame_count += 1
-
-            # Release the video file handle
-            video_capture.release()
-            print(f"  Finished. Saved {saved_frame_count} frames to '{landmark_folder_path}'")
-
-        except Exception as e:
-            print(f"  An unexpected error occurred while processing {video_filename}: {e}")
+    # 6. Extract the pending videos in parallel, one process per video
+    print(f"Processing {len(pending)} video(s) with up to {workers or os.cpu_count()} worker processes.")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(extract_video, video_path, folder, landmark_name, frame_skip, dedupe): video_filename
+            for video_filename, (video_path, folder, landmark_name, _) in pending.items()
+        }
+        for future in as_completed(futures):
+            video_filename = futures[future]
+            _, landmark_folder_path, landmark_name, digest = pending[video_filename]
+            try:
+                saved_frame_count, skipped_duplicates = future.result()
+            except Exception as e:
+                print(f"  Error while processing {video_filename}: {e}")
+                manifest.pop(video_filename, None)
+                continue
+
+            manifest[video_filename] = {'sha1': digest, 'landmark': landmark_name, 'frames': saved_frame_count, 'settings': settings}
+            message = f"  '{video_filename}': saved {saved_frame_count} frames to '{landmark_folder_path}'"
+            if dedupe:
+                message += f" ({skipped_duplicates} near-duplicates skipped)"
+            print(message)
+            # Save after every video so an interrupted run keeps its progress.
+            save_manifest(manifest_path, manifest)
 
     print("\n--- Frame Extraction Complete ---")
     print(f"Your dataset is now ready in the '{OUTPUT_DATASET_FOLDER}' folder.")
@@ -103,4 +222,10 @@ def extract_frames():
 
 # This makes the script runnable from the command line
 if __name__ == '__main__':
-    extract_frames()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Extract landmark training frames from videos.")
+    parser.add_argument('--full', action='store_true', help="Delete the dataset and re-extract every video.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument('--dedupe', action='store_true', help="Skip frames that are near-identical to the previous saved frame.")
+    parser.add_argument('--frame-skip', type=int, default=FRAME_SKIP, help="Save one frame out of every N.")
+    args = parser.parse_args()
+    extract_frames(full_rebuild=args.full, workers=args.workers, dedupe=args.dedupe, frame_skip=args.frame_skip)
@@ -18,6 +18,12 @@ function App() {
   const videoRef = useRef(null);
   const socketRef = useRef(null);
   const requestRef = useRef(null);
+  const frameTimerRef = useRef(null);
+  // Capture settings chosen by the server (sent as 'quality_settings').
+  const qualityRef = useRef({ width: 640, jpeg_quality: 0.6, fps: 4 });
+  // Identifies the camera so the server can use its calibrated focal length
+  // (backend/models/camera_profiles.json). The track label names the camera model.
+  const deviceRef = useRef(null);
 
   const speak = (text, interrupt = false) => {
     if (interrupt) window.speechSynthesis.cancel();
@@ -80,23 +86,34 @@ function App() {
     }
   }, [isListening, parseNavigationCommand]);
 
-  const captureAndSendForObstacles = useCallback(() => {
-    if (!videoRef.current || videoRef.current.paused || videoRef.current.ended || !socketRef.current) return;
+  // Draws the current video frame, scaled down to the server's requested width.
+  const captureFrame = useCallback(() => {
+    const video = videoRef.current;
+    const scale = Math.min(1, qualityRef.current.width / video.videoWidth);
     const canvas = document.createElement('canvas');
-    canvas.width = videoRef.current.videoWidth;
-    canvas.height = videoRef.current.videoHeight;
-    canvas.getContext('2d').drawImage(videoRef.current, 0, 0, canvas.width, canvas.height);
-    const imageData = canvas.toDataURL('image/jpeg', 0.5);
-    socketRef.current.emit('process_frame_for_obstacles', { image_data: imageData });
+    canvas.width = Math.round(video.videoWidth * scale);
+    canvas.height = Math.round(video.videoHeight * scale);
+    canvas.getContext('2d').drawImage(video, 0, 0, canvas.width, canvas.height);
+    return canvas.toDataURL('image/jpeg', qualityRef.current.jpeg_quality);
   }, []);
 
+  const captureAndSendForObstacles = useCallback(() => {
+    if (!videoRef.current || videoRef.current.paused || videoRef.current.ended || !socketRef.current) return;
+    socketRef.current.emit('process_frame_for_obstacles', { image_data: captureFrame(), device: deviceRef.current });
+  }, [captureFrame]);
+
   const startObstacleDetectionLoop = useCallback(() => {
-    requestRef.current = requestAnimationFrame(captureAndSendForObstacles);
+    // Wait one frame interval at the server's requested FPS before capturing.
+    clearTimeout(frameTimerRef.current);
+    frameTimerRef.current = setTimeout(() => {
+      requestRef.current = requestAnimationFrame(captureAndSendForObstacles);
+    }, 1000 / qualityRef.current.fps);
   }, [captureAndSendForObstacles]);
 
   useEffect(() => {
     socketRef.current = io(SOCKET_URL, { transports: ['websocket'] });
     socketRef.current.on('connect', () => console.log('✅ Socket connected!'));
+    socketRef.current.on('quality_settings', (settings) => { qualityRef.current = settings; });
     socketRef.current.on('scene_summary', (data) => { setStatusText(data.summary); speak(data.summary); });
     socketRef.current.on('navigation_response', (data) => {
       if (data.error) { speak(data.error); setStatusText(data.error); } 
@@ -115,6 +132,7 @@ function App() {
     return () => {
       if (socketRef.current) socketRef.current.disconnect();
       if (requestRef.current) cancelAnimationFrame(requestRef.current);
+      clearTimeout(frameTimerRef.current);
     };
   }, [mode, startObstacleDetectionLoop]);
 
@@ -122,6 +140,8 @@ function App() {
     try {
       const stream = await navigator.mediaDevices.getUserMedia({ video: { facingMode: 'environment' }, audio: true });
       if (videoRef.current) videoRef.current.srcObject = stream;
+      const [videoTrack] = stream.getVideoTracks();
+      if (videoTrack) deviceRef.current = videoTrack.label || videoTrack.getSettings().deviceId || null;
       const audioContext = new (window.AudioContext || window.webkitAudioContext)();
       const oscillator = audioContext.createOscillator();
       oscillator.frequency.value = 0;
@@ -140,15 +160,11 @@ function App() {
   const handleExplorerTap = () => {
     if(!socketRef.current) return;
     setStatusText('Analyzing...');
-    const canvas = document.createElement('canvas');
-    canvas.width = videoRef.current.videoWidth;
-    canvas.height = videoRef.current.videoHeight;
-    canvas.getContext('2d').drawImage(videoRef.current, 0, 0);
-    const imageData = canvas.toDataURL('image/jpeg');
-    socketRef.current.emit('describe_scene', { image: imageData });
+    socketRef.current.emit('describe_scene', { image: captureFrame(), device: deviceRef.current });
   };
 
   const stopObstacleDetectionLoop = () => {
+    clearTimeout(frameTimerRef.current);
     if (requestRef.current) { cancelAnimationFrame(requestRef.current); requestRef.current = null; }
   };
 
@@ -0,0 +1,279 @@
+# load_test.py
+# Simulates many phones streaming camera frames to a local backend/app.py and
+# records end-to-end latency, dropped frames and (optionally) server CPU usage.
+#
+# Start the server first (python backend/app.py), then for example:
+#   python load_test.py --clients 200 --fps 2 --duration 60 --server-pid <pid>
+
+import argparse
+import base64
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+import socketio
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# --- Configuration ---
+DEFAULT_SERVER_URL = 'http://localhost:5000'
+DEFAULT_IMAGE_SOURCES = [os.path.join(PROJECT_ROOT, 'test_image.jpg'), os.path.join(PROJECT_ROOT, 'landmark_dataset')]
+# Only a sample of the bundled images is loaded; every client cycles through them.
+MAX_IMAGES = 50
+NAVIGATION_ROUTES = [('entrance', 'canteen'), ('parking', 'aiml block'), ('ug block', 'engineering block')]
+# Which reply event answers which request event.
+RESPONSE_EVENTS = {
+    'describe_scene': 'scene_summary',
+    # The server skips obstacle_alert when a frame fails or is shed, but always
+    # ends with request_next_frame.
+    'process_frame_for_obstacles': 'request_next_frame',
+    'get_navigation': 'navigation_response',
+}
+
+def load_frames(sources, limit):
+    """Loads bundled JPEGs as data URLs, the same format App.js sends."""
+    paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            for root, _, files in os.walk(source):
+                paths.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(('.jpg', '.jpeg')))
+        elif os.path.isfile(source):
+            paths.append(source)
+    random.Random(123).shuffle(paths)
+    frames = []
+    for path in paths[:limit]:
+        with open(path, 'rb') as f:
+            frames.append('data:image/jpeg;base64,' + base64.b64encode(f.read()).decode('ascii'))
+    return frames
+
+class SimulatedClient:
+    """One phone: keeps at most one request of each kind in flight, like App.js."""
+    def __init__(self, client_id, url, frames, options, stats):
+        self.client_id = client_id
+        self.url = url
+        self.frames = frames
+        self.options = options
+        self.stats = stats
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.sio = socketio.Client(reconnection=False)
+        for request_event, response_event in RESPONSE_EVENTS.items():
+            self.sio.on(response_event, self._make_handler(request_event))
+
+    def _make_handler(self, request_event):
+        def handler(data=None):
+            with self.lock:
+                sent_at = self.pending.pop(request_event, None)
+            if sent_at is not None:
+                self.stats.record_latency(request_event, time.perf_counter() - sent_at)
+        return handler
+
+    def _send(self, event, payload):
+        now = time.perf_counter()
+        with self.lock:
+            sent_at = self.pending.get(event)
+            if sent_at is not None:
+                if now - sent_at < self.options.timeout:
+                    # The previous request is still in flight: this frame is dropped.
+                    self.stats.record_drop(event)
+                    return
+                self.stats.record_timeout(event)
+            self.pending[event] = now
+        self.stats.record_sent(event)
+        self.sio.emit(event, payload)
+
+    def run(self, stop_event):
+        try:
+            self.sio.connect(self.url, transports=['websocket'])
+        except Exception as e:
+            self.stats.record_connect_error(str(e))
+            return
+
+        rng = random.Random(self.client_id)
+        interval = 1.0 / self.options.fps
+        next_frame = time.perf_counter() + rng.random() * interval
+        next_navigation = time.perf_counter() + rng.random() * self.options.nav_interval
+        frame_index = self.client_id
+
+        try:
+            while not stop_event.is_set():
+                now = time.perf_counter()
+                if self.options.nav_interval > 0 and now >= next_navigation:
+                    start, end = rng.choice(NAVIGATION_ROUTES)
+                    self._send('get_navigation', {'start': start, 'end': end})
+                    next_navigation += self.options.nav_interval
+                if now >= next_frame:
+                    image = self.frames[frame_index % len(self.frames)]
+                    frame_index += 1
+                    if rng.random() < self.options.describe_ratio:
+                        self._send('describe_scene', {'image': image})
+                    else:
+                        self._send('process_frame_for_obstacles', {'image_data': image})
+                    next_frame += interval
+                wake_at = min(next_frame, next_navigation) if self.options.nav_interval > 0 else next_frame
+                stop_event.wait(max(0.0, wake_at - time.perf_counter()))
+        finally:
+            with self.lock:
+                for event in self.pending:
+                    self.stats.record_timeout(event)
+                self.pending.clear()
+            self.sio.disconnect()
+
+class LoadStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {event: [] for event in RESPONSE_EVENTS}
+        self.sent = {event: 0 for event in RESPONSE_EVENTS}
+        self.dropped = {event: 0 for event in RESPONSE_EVENTS}
+        self.timeouts = {event: 0 for event in RESPONSE_EVENTS}
+        self.connect_errors = []
+        self.cpu_samples = []
+
+    def record_latency(self, event, seconds):
+        with self.lock:
+            self.latencies[event].append(seconds * 1000)
+
+    def record_sent(self, event):
+        with self.lock:
+            self.sent[event] += 1
+
+    def record_drop(self, event):
+        with self.lock:
+            self.dropped[event] += 1
+
+    def record_timeout(self, event):
+        with self.lock:
+            self.timeouts[event] += 1
+
+    def record_connect_error(self, message):
+        with self.lock:
+            self.connect_errors.append(message)
+
+    def summary(self, duration):
+        result = {'events': {}, 'connect_errors': len(self.connect_errors)}
+        for event in RESPONSE_EVENTS:
+            latencies = np.array(self.latencies[event])
+            entry = {
+                'sent': self.sent[event],
+                'answered': len(latencies),
+                'dropped': self.dropped[event],
+                'timed_out': self.timeouts[event],
+                'throughput_per_s': len(latencies) / duration,
+            }
+            if len(latencies):
+                entry.update({
+                    'p50_ms': float(np.percentile(latencies, 50)),
+                    'p95_ms': float(np.percentile(latencies, 95)),
+                    'p99_ms': float(np.percentile(latencies, 99)),
+                    'max_ms': float(latencies.max()),
+                })
+            result['events'][event] = entry
+        if self.cpu_samples:
+            cpu = np.array(self.cpu_samples)
+            result['server_cpu_percent'] = {'mean': float(cpu.mean()), 'max': float(cpu.max())}
+        return result
+
+def read_process_cpu_seconds(pid):
+    """Total user+system CPU time of a process, or None if it can't be read."""
+    if psutil is not None:
+        times = psutil.Process(pid).cpu_times()
+        return times.user + times.system
+    try:
+        with open(f'/proc/{pid}/stat', 'r') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        # utime and stime are fields 14 and 15 of /proc/<pid>/stat.
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return None
+
+def sample_server_cpu(pid, stats, stop_event, interval=1.0):
+    last_cpu = read_process_cpu_seconds(pid)
+    last_time = time.perf_counter()
+    if last_cpu is None:
+        print(f"Warning: Cannot read CPU usage of process {pid}.")
+        return
+    while not stop_event.wait(interval):
+        cpu = read_process_cpu_seconds(pid)
+        now = time.perf_counter()
+        if cpu is None:
+            return
+        stats.cpu_samples.append(100.0 * (cpu - last_cpu) / (now - last_time))
+        last_cpu, last_time = cpu, now
+
+def run_load_test(options):
+    frames = load_frames(DEFAULT_IMAGE_SOURCES, MAX_IMAGES)
+    if not frames:
+        print("Error: No test images found.")
+        return None
+
+    stats = LoadStats()
+    stop_event = threading.Event()
+    threads = []
+
+    if options.server_pid:
+        threads.append(threading.Thread(target=sample_server_cpu, args=(options.server_pid, stats, stop_event), daemon=True))
+
+    print(f"--- Starting {options.clients} clients at {options.fps} fps against {options.url} ---")
+    for client_id in range(options.clients):
+        client = SimulatedClient(client_id, options.url, frames, options, stats)
+        threads.append(threading.Thread(target=client.run, args=(stop_event,), daemon=True))
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+        # Stagger connections so the server isn't hit by one thundering herd.
+        time.sleep(options.ramp / max(options.clients, 1))
+
+    try:
+        stop_event.wait(max(0.0, options.duration - (time.perf_counter() - started)))
+    except KeyboardInterrupt:
+        print("Interrupted, stopping clients...")
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout=options.timeout + 5)
+    duration = time.perf_counter() - started
+
+    result = stats.summary(duration)
+    result.update({'clients': options.clients, 'fps': options.fps, 'duration_s': duration})
+    for event, entry in result['events'].items():
+        line = f"  {event:<28} sent {entry['sent']:<6} answered {entry['answered']:<6} dropped {entry['dropped']:<6} timed out {entry['timed_out']:<5}"
+        if 'p50_ms' in entry:
+            line += f" p50 {entry['p50_ms']:.0f} ms  p95 {entry['p95_ms']:.0f} ms  p99 {entry['p99_ms']:.0f} ms"
+        print(line)
+    if 'server_cpu_percent' in result:
+        print(f"  server CPU: mean {result['server_cpu_percent']['mean']:.0f}%, max {result['server_cpu_percent']['max']:.0f}%")
+    if stats.connect_errors:
+        print(f"  {len(stats.connect_errors)} clients failed to connect (first error: {stats.connect_errors[0]})")
+
+    with open(options.output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to '{options.output}'.")
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Socket.IO load generator for backend/app.py.")
+    parser.add_argument('--url', default=DEFAULT_SERVER_URL, help="Server URL (default: %(default)s).")
+    parser.add_argument('--clients', type=int, default=50, help="Number of simulated phones.")
+    parser.add_argument('--fps', type=float, default=2.0, help="Frames per second sent by each client.")
+    parser.add_argument('--duration', type=float, default=30.0, help="Test length in seconds.")
+    parser.add_argument('--describe-ratio', type=float, default=0.1,
+                        help="Fraction of frames sent as describe_scene; the rest go to the obstacle stream.")
+    parser.add_argument('--nav-interval', type=float, default=10.0,
+                        help="Seconds between get_navigation calls per client (0 disables them).")
+    parser.add_argument('--timeout', type=float, default=5.0, help="Seconds before an unanswered request counts as timed out.")
+    parser.add_argument('--ramp', type=float, default=5.0, help="Seconds over which clients connect.")
+    parser.add_argument('--server-pid', type=int, default=None, help="PID of the server process, to sample its CPU usage.")
+    parser.add_argument('--output', default='load_test_results.json', help="Where to write the JSON results.")
+    options = parser.parse_args()
+    if options.fps <= 0:
+        sys.exit("--fps must be positive")
+    run_load_test(options)
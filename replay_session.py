@@ -0,0 +1,188 @@
+# replay_session.py
+# Replays a session recorded by the server (VA_RECORD_DIR=<dir> python backend/app.py)
+# through the real Socket.IO handlers, in-process, and records every reply and its
+# latency. Compare two builds by replaying the same recording on each:
+#   python replay_session.py recordings/walk1 --output before.json
+#   python replay_session.py recordings/walk1 --output after.json --compare before.json
+#
+# Events are replayed one at a time, in recorded order. With --speed 1 they are
+# sent at the recorded pace (an event is never sent before the previous reply);
+# --speed 0 sends them back to back.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'backend'))
+
+from modules.session_recorder import read_session
+
+# --- Configuration ---
+DEFAULT_OUTPUT_FILE = 'replay_results.json'
+# The reply that marks the end of handling for each request event.
+FINAL_EVENTS = {
+    'describe_scene': 'scene_summary',
+    'process_frame_for_obstacles': 'request_next_frame',
+    'get_navigation': 'navigation_response',
+    'confirm_position': 'position_confirmation',
+    'enroll_landmark': 'enrollment_response',
+}
+# Replies that depend on timing rather than on the input; they are kept in the
+# results but ignored when comparing outputs between builds.
+TIMING_DEPENDENT_EVENTS = {'quality_settings'}
+# How often to check for replies, in seconds.
+POLL_INTERVAL = 0.002
+
+def wait_for_replies(client, final_event, timeout):
+    """Collects replies until final_event arrives. Returns (replies, timed_out)."""
+    replies = []
+    deadline = time.perf_counter() + timeout
+    while True:
+        for packet in client.get_received():
+            replies.append({'name': packet['name'], 'args': packet['args']})
+            if packet['name'] == final_event:
+                return replies, False
+        # Unknown events have no final reply; give them one timeout's worth to answer.
+        if time.perf_counter() > deadline:
+            return replies, final_event is not None
+        time.sleep(POLL_INTERVAL)
+
+def summarize(latencies):
+    latencies = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        'count': len(latencies),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p95_ms': float(np.percentile(latencies, 95)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'mean_ms': float(latencies.mean()),
+    }
+
+def comparable_output(result):
+    return [reply for reply in result['replies'] if reply['name'] not in TIMING_DEPENDENT_EVENTS]
+
+def compare_results(results, baseline):
+    """Prints and returns output mismatches and latency changes against a baseline run."""
+    mismatches = []
+    for current, previous in zip(results['events'], baseline['events']):
+        if current['event'] != previous['event']:
+            raise ValueError(f"Recordings differ at event {current['index']}; was the same session replayed?")
+        if comparable_output(current) != comparable_output(previous):
+            mismatches.append({
+                'index': current['index'],
+                'event': current['event'],
+                'expected': comparable_output(previous),
+                'actual': comparable_output(current),
+            })
+
+    latency_changes = {}
+    for event, stats in results['latency'].items():
+        before = baseline['latency'].get(event)
+        if before is None:
+            continue
+        latency_changes[event] = {
+            key: stats[key] - before[key] for key in ('p50_ms', 'p95_ms', 'p99_ms', 'mean_ms')
+        }
+
+    print("\n--- Compared with baseline ---")
+    print(f"  Output mismatches: {len(mismatches)} of {min(len(results['events']), len(baseline['events']))} events")
+    for mismatch in mismatches[:5]:
+        print(f"    #{mismatch['index']} {mismatch['event']}: {mismatch['expected']} -> {mismatch['actual']}")
+    for event, change in latency_changes.items():
+        print(f"  {event:<28} p50 {change['p50_ms']:+8.2f} ms  p95 {change['p95_ms']:+8.2f} ms  p99 {change['p99_ms']:+8.2f} ms")
+    return {'mismatches': mismatches, 'latency_changes': latency_changes}
+
+def replay(session_dir, speed=0.0, timeout=10.0, output_file=DEFAULT_OUTPUT_FILE, compare_file=None):
+    # Replay in-process with native threads, and don't record the replay itself.
+    os.environ.setdefault('VA_ASYNC_MODE', 'threading')
+    os.environ.pop('VA_RECORD_DIR', None)
+    os.environ.pop('VA_MESSAGE_QUEUE', None)
+
+    print("--- Loading backend ---")
+    import app as server
+
+    print(f"\n--- Replaying '{session_dir}' ---")
+    clients = {}
+    events = []
+    latencies = {}
+    timeouts = 0
+    first_time = None
+    started = time.perf_counter()
+
+    try:
+        for index, entry in enumerate(read_session(session_dir)):
+            if first_time is None:
+                first_time = entry['t']
+            if speed > 0:
+                wait = (entry['t'] - first_time) / speed - (time.perf_counter() - started)
+                if wait > 0:
+                    time.sleep(wait)
+
+            # One test client per recorded client, so per-client state is rebuilt faithfully.
+            client = clients.get(entry['sid'])
+            if client is None:
+                client = clients[entry['sid']] = server.socketio.test_client(server.app)
+                client.get_received()
+
+            event = entry['event']
+            t0 = time.perf_counter()
+            if entry['payload'] is None:
+                client.emit(event)
+            else:
+                client.emit(event, entry['payload'])
+            replies, timed_out = wait_for_replies(client, FINAL_EVENTS.get(event), timeout)
+            latency_ms = (time.perf_counter() - t0) * 1000
+
+            timeouts += timed_out
+            latencies.setdefault(event, []).append(latency_ms)
+            events.append({
+                'index': index,
+                'event': event,
+                'offset_s': entry['t'] - first_time,
+                'latency_ms': latency_ms,
+                'timed_out': timed_out,
+                'replies': replies,
+            })
+    finally:
+        for client in clients.values():
+            client.disconnect()
+
+    elapsed = time.perf_counter() - started
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'session': os.path.abspath(session_dir),
+        'speed': speed,
+        'clients': len(clients),
+        'duration_s': elapsed,
+        'timeouts': timeouts,
+        'latency': {event: summarize(values) for event, values in latencies.items()},
+        'events': events,
+    }
+    print(f"  {len(events)} events from {len(clients)} clients in {elapsed:.1f}s, {timeouts} timed out")
+    for event, stats in results['latency'].items():
+        print(f"  {event:<28} n={stats['count']:<5} p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms  "
+              f"p99 {stats['p99_ms']:7.2f} ms")
+
+    if compare_file:
+        with open(compare_file, 'r') as f:
+            results['comparison'] = compare_results(results, json.load(f))
+
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to '{output_file}'.")
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay a recorded session through backend/app.py's handlers.")
+    parser.add_argument('session', help="Directory written by the server with VA_RECORD_DIR set.")
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help="Replay speed: 1 = recorded pace, 4 = four times faster, 0 = as fast as possible (default).")
+    parser.add_argument('--timeout', type=float, default=10.0, help="Seconds to wait for the reply to one event.")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_FILE, help="Where to write the JSON results.")
+    parser.add_argument('--compare', default=None, help="Results of an earlier replay to compare outputs and latencies with.")
+    args = parser.parse_args()
+    replay(args.session, speed=args.speed, timeout=args.timeout, output_file=args.output, compare_file=args.compare)
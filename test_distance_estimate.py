@@ -0,0 +1,65 @@
+# test_distance_estimate.py
+# Checks the vectorized distance estimate used for obstacle alerts: which side of
+# the box it measures, and that it returns inf (never NaN or a bogus number) when
+# there is nothing to measure. Runs standalone or under pytest.
+
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+import numpy as np
+
+from modules.object_detection import estimate_distances
+
+IMAGE_WIDTH = 640
+IMAGE_HEIGHT = 480
+FOCAL_LENGTH = 600
+NAN = float('nan')
+
+def estimate(boxes, widths, heights, truncated=None):
+    return estimate_distances(
+        np.array(boxes, dtype=np.float64), np.array(widths, dtype=np.float64),
+        np.array(heights, dtype=np.float64), IMAGE_WIDTH, IMAGE_HEIGHT, FOCAL_LENGTH, truncated
+    )
+
+def test_uses_height_for_whole_boxes():
+    # 0.4 of the frame height is 192 px: 1.7 m * 600 / 192.
+    distances = estimate([[0.2, 0.4, 0.6, 0.6]], [0.5], [1.7])
+    assert math.isclose(distances[0], 1.7 * FOCAL_LENGTH / 192)
+
+def test_uses_width_when_cut_off_or_height_unknown():
+    # 0.2 of the frame width is 128 px: 0.5 m * 600 / 128.
+    from_width = 0.5 * FOCAL_LENGTH / 128
+    distances = estimate(
+        [[0.3, 0.4, 1.0, 0.6],   # Runs off the bottom of the frame.
+         [0.0, 0.4, 0.5, 0.6],   # Runs off the top.
+         [0.2, 0.4, 0.6, 0.6]],  # Whole, but the real height is unknown.
+        [0.5, 0.5, 0.5], [1.7, 1.7, NAN]
+    )
+    assert np.allclose(distances, from_width)
+
+def test_truncated_overrides_the_frame_edge_check():
+    distances = estimate([[0.3, 0.4, 1.0, 0.6]], [0.5], [1.7], truncated=np.array([False]))
+    assert math.isclose(distances[0], 1.7 * FOCAL_LENGTH / (0.7 * IMAGE_HEIGHT))
+
+def test_falls_back_to_height_without_a_width():
+    distances = estimate([[0.3, 0.4, 1.0, 0.6]], [NAN], [1.7])
+    assert math.isclose(distances[0], 1.7 * FOCAL_LENGTH / (0.7 * IMAGE_HEIGHT))
+
+def test_no_estimate_is_inf():
+    distances = estimate(
+        [[0.2, 0.4, 0.6, 0.6],   # Unknown object size.
+         [0.5, 0.5, 0.5, 0.5]],  # Zero-sized box.
+        [NAN, 0.5], [NAN, 1.7]
+    )
+    assert np.all(np.isposinf(distances))
+
+if __name__ == '__main__':
+    test_uses_height_for_whole_boxes()
+    test_uses_width_when_cut_off_or_height_unknown()
+    test_truncated_overrides_the_frame_edge_check()
+    test_falls_back_to_height_without_a_width()
+    test_no_estimate_is_inf()
+    print("--- Distance estimates are as expected ---")
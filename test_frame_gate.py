@@ -0,0 +1,68 @@
+# test_frame_gate.py
+# Checks when FrameChangeGate lets obstacle detections be reused: only for frames
+# close to the one they were detected on, and never past MAX_REUSE_SECONDS.
+# Runs standalone or under pytest.
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+import numpy as np
+
+from modules import frame_gate
+from modules.frame_gate import FrameChangeGate, CHANGE_THRESHOLD
+
+def frame(gray_level):
+    return np.full((240, 320, 3), gray_level, dtype=np.uint8)
+
+def test_reuses_result_for_unchanged_frame():
+    gate = FrameChangeGate()
+    assert gate.cached_result(frame(100)) is None # Nothing stored yet.
+    gate.store(['chair'])
+    assert gate.cached_result(frame(100)) == ['chair']
+    assert gate.cached_result(frame(101)) == ['chair']
+
+def test_detects_again_after_a_change():
+    gate = FrameChangeGate()
+    gate.cached_result(frame(100))
+    gate.store(['chair'])
+    assert gate.cached_result(frame(100 + int(CHANGE_THRESHOLD) + 10)) is None
+
+def test_slow_changes_add_up():
+    gate = FrameChangeGate()
+    gate.cached_result(frame(100))
+    gate.store(['chair'])
+    # Each frame differs from the previous one by less than the threshold, but
+    # they are all compared with the frame the result was detected on.
+    step = int(CHANGE_THRESHOLD * 0.75)
+    assert gate.cached_result(frame(100 + step)) == ['chair']
+    assert gate.cached_result(frame(100 + 2 * step)) is None
+
+def test_store_uses_the_frame_that_was_detected():
+    gate = FrameChangeGate()
+    gate.cached_result(frame(100))
+    gate.store(['chair'])
+    gate.cached_result(frame(150))
+    gate.store(['table'])
+    assert gate.cached_result(frame(150)) == ['table']
+    assert gate.cached_result(frame(100)) is None
+
+def test_result_expires():
+    original = frame_gate.MAX_REUSE_SECONDS
+    frame_gate.MAX_REUSE_SECONDS = -1.0
+    try:
+        gate = FrameChangeGate()
+        gate.cached_result(frame(100))
+        gate.store(['chair'])
+        assert gate.cached_result(frame(100)) is None
+    finally:
+        frame_gate.MAX_REUSE_SECONDS = original
+
+if __name__ == '__main__':
+    test_reuses_result_for_unchanged_frame()
+    test_detects_again_after_a_change()
+    test_slow_changes_add_up()
+    test_store_uses_the_frame_that_was_detected()
+    test_result_expires()
+    print("--- Frame gate reuses results as expected ---")
@@ -0,0 +1,58 @@
+# test_message_queue.py
+# Checks that an emit made on one worker reaches another worker through the local
+# message broker. Runs standalone (python test_message_queue.py) or under pytest.
+
+import os
+import socket
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+import socketio
+
+from modules.message_queue import MessageBroker, LocalQueueManager
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def start_worker(url):
+    """A Socket.IO server with its own LocalQueueManager, as one app.py worker would have."""
+    manager = LocalQueueManager(url)
+    server = socketio.Server(client_manager=manager, async_mode='threading')
+    manager.initialize()
+    return server, manager
+
+def test_emit_crosses_workers():
+    url = f'local://127.0.0.1:{free_port()}'
+    broker = MessageBroker(url)
+    broker.start()
+    try:
+        sender, _ = start_worker(url)
+        _, receiver_manager = start_worker(url)
+
+        received = []
+        arrived = threading.Event()
+        def handle_emit(message):
+            received.append(message)
+            arrived.set()
+        receiver_manager._handle_emit = handle_emit
+
+        # Subscriptions connect in the background; keep emitting until one gets through.
+        for _ in range(50):
+            sender.emit('obstacle_alert', {'message': 'Path is clear.'}, to='some-client')
+            if arrived.wait(0.1):
+                break
+
+        assert received, "emit never reached the other worker"
+        assert received[0]['event'] == 'obstacle_alert'
+        assert received[0]['data'] == {'message': 'Path is clear.'}
+        assert received[0]['room'] == 'some-client'
+    finally:
+        broker.stop()
+
+if __name__ == '__main__':
+    test_emit_crosses_workers()
+    print("--- Emit crossed workers through the message broker ---")
@@ -0,0 +1,149 @@
+# test_routing_graph.py
+# Checks that routing on the contracted graph (chains of polyline vertices merged
+# into single edges) finds the same shortest routes as Dijkstra on the full map.
+# Runs standalone (python test_routing_graph.py) or under pytest.
+
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+import networkx as nx
+
+from modules.navigator import Navigator
+
+ORIGIN = (77.5900, 12.9700)
+STEP = 0.0001 # About 11 m.
+
+def point(x, y):
+    """Map coordinates from a small grid around ORIGIN, in STEP units."""
+    return [round(ORIGIN[0] + x * STEP, 7), round(ORIGIN[1] + y * STEP, 7)]
+
+# Polylines with many degree-2 vertices, two pairs of parallel chains between the
+# same intersections, a loop, a landmark in the middle of a chain and a part of the
+# map that is not connected to the rest.
+PATHS = [
+    # gate -> library (mid-chain) -> junction
+    [point(0, 0), point(1, 0.2), point(2, 0), point(3, 0.3), point(4, 0), point(5, 0.1), point(6, 0)],
+    # A second, longer way from gate to junction.
+    [point(0, 0), point(0.5, 2), point(2, 3), point(4, 3), point(5.5, 2), point(6, 0)],
+    # junction -> canteen, and a shorter parallel chain between the same two nodes.
+    [point(6, 0), point(7, 1.5), point(8, 2.5), point(9, 1.5), point(10, 0)],
+    [point(6, 0), point(8, -0.4), point(10, 0)],
+    # canteen -> dead end at the restroom.
+    [point(10, 0), point(11, -1), point(12, -1.2), point(13, -2)],
+    # A loop that starts and ends at the canteen.
+    [point(10, 0), point(10.5, 1), point(11, 0.5), point(10, 0)],
+    # A branch from the library's chain vertex to the second restroom.
+    [point(2, 0), point(2.2, -1.5), point(2.1, -3)],
+    # Not connected to the rest of the map.
+    [point(20, 20), point(21, 20.5), point(22, 20)],
+]
+
+LANDMARKS = [
+    ('Gate', point(0, 0), 'exit'),
+    ('Library', point(3, 0.3), None),
+    ('Junction Cafe', point(6, 0), 'food'),
+    ('Canteen', point(10, 0), 'food'),
+    ('Restroom East', point(13, -2), 'restroom'),
+    ('Restroom West', point(2.1, -3), 'restroom'),
+    ('Far Exit', point(22, 20), 'exit'),
+]
+
+def build_navigator():
+    features = [
+        {'type': 'Feature', 'geometry': {'type': 'LineString', 'coordinates': path}, 'properties': {}}
+        for path in PATHS
+    ]
+    for name, coords, category in LANDMARKS:
+        properties = {'name': name}
+        if category:
+            properties['category'] = category
+        features.append({'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': coords}, 'properties': properties})
+
+    with tempfile.TemporaryDirectory() as directory:
+        map_path = os.path.join(directory, 'map.geojson')
+        with open(map_path, 'w') as f:
+            json.dump({'type': 'FeatureCollection', 'features': features}, f)
+        return Navigator(map_path)
+
+def route_length(navigator, path_coords):
+    return sum(navigator.graph[u][v]['weight'] for u, v in zip(path_coords, path_coords[1:]))
+
+def raw_distances(navigator):
+    """{(start_name, end_name): shortest walking distance} on the uncontracted graph."""
+    distances = {}
+    for start_name, start_node in navigator.landmarks.items():
+        lengths = nx.single_source_dijkstra_path_length(navigator.graph, start_node, weight='weight')
+        for end_name, end_node in navigator.landmarks.items():
+            if end_node in lengths:
+                distances[start_name, end_name] = lengths[end_node]
+    return distances
+
+def test_routing_graph_is_contracted():
+    navigator = build_navigator()
+    assert navigator._routing_graph.number_of_nodes() < navigator.graph.number_of_nodes()
+    # Landmarks are kept even where they sit in the middle of a chain.
+    for coords in navigator.landmarks.values():
+        assert coords in navigator._routing_graph
+
+def test_contracted_routes_match_full_graph():
+    navigator = build_navigator()
+    distances = raw_distances(navigator)
+
+    for start_name, end_name in itertools.permutations(navigator.landmarks, 2):
+        start_node = navigator.landmarks[start_name]
+        end_node = navigator.landmarks[end_name]
+        instructions = navigator.find_shortest_path(start_name, end_name)
+        if (start_name, end_name) not in distances:
+            assert instructions is None, f"{start_name} -> {end_name} should be unreachable"
+            continue
+
+        route = nx.dijkstra_path(navigator._routing_graph, start_node, end_node, weight='weight')
+        path_coords = navigator._expand_route(route)
+        assert path_coords[0] == start_node and path_coords[-1] == end_node
+        # Every step of the expanded route is an edge of the full map...
+        assert all(navigator.graph.has_edge(u, v) for u, v in zip(path_coords, path_coords[1:]))
+        # ...and the route is as short as the best one on the full map.
+        assert math.isclose(route_length(navigator, path_coords), distances[start_name, end_name], rel_tol=1e-9)
+        assert instructions == navigator._instructions(path_coords)
+
+def test_routes_from_matches_find_shortest_path():
+    navigator = build_navigator()
+    names = list(navigator.landmarks) + ['nowhere']
+    for start_name in navigator.landmarks:
+        routes = navigator.routes_from(start_name, names)
+        assert routes == {name: navigator.find_shortest_path(start_name, name) for name in names}
+        assert routes[start_name] is None
+
+def test_nearest_landmark_is_closest_by_walking_distance():
+    navigator = build_navigator()
+    distances = raw_distances(navigator)
+    categories = set(navigator.landmark_categories.values())
+
+    for start_name in navigator.landmarks:
+        for category in categories:
+            reachable = {
+                name: distances[start_name, name]
+                for name, landmark_category in navigator.landmark_categories.items()
+                if landmark_category == category and name != start_name and (start_name, name) in distances
+            }
+            result = navigator.nearest_landmark(start_name, category)
+            if not reachable:
+                assert result is None
+                continue
+            name, distance, instructions = result
+            assert name == min(reachable, key=reachable.get)
+            assert math.isclose(distance, reachable[name], rel_tol=1e-9)
+            assert instructions == navigator.find_shortest_path(start_name, name)
+
+if __name__ == '__main__':
+    test_routing_graph_is_contracted()
+    test_contracted_routes_match_full_graph()
+    test_routes_from_matches_find_shortest_path()
+    test_nearest_landmark_is_closest_by_walking_distance()
+    print("--- Contracted routing matches the full map ---")
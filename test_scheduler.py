@@ -0,0 +1,121 @@
+# test_scheduler.py
+# Checks that PriorityScheduler runs queued jobs most urgent class first, and
+# sheds jobs that waited past their deadline instead of running them.
+# Runs standalone or under pytest.
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from flask import Flask
+from flask_socketio import SocketIO
+
+from modules.metrics import Metrics
+from modules.scheduler import PriorityScheduler, DeadlineExceeded, WORK_CLASSES
+
+def start_scheduler():
+    """A one-worker scheduler on a threading-mode server, as app.py sets it up."""
+    socketio = SocketIO(Flask(__name__), async_mode='threading')
+    metrics = Metrics()
+    scheduler = PriorityScheduler(socketio, workers=1, metrics=metrics)
+    scheduler.start()
+    return scheduler, metrics
+
+def metric_value(metrics, line_prefix):
+    for line in metrics.render_prometheus().splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.split()[-1])
+    return 0.0
+
+def wait_for_queue_depth(metrics, depth, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while metric_value(metrics, 'va_queue_depth') != depth:
+        assert time.monotonic() < deadline, f"queue never reached depth {depth}"
+        time.sleep(0.005)
+
+def occupy_worker(scheduler):
+    """Queues a job that holds the only worker until the returned event is set."""
+    release = threading.Event()
+    started = threading.Event()
+    def block():
+        started.set()
+        release.wait()
+    thread = threading.Thread(target=scheduler.run, args=('scene', block))
+    thread.start()
+    assert started.wait(5.0), "blocking job never started"
+    return release, thread
+
+def submit(scheduler, work_class, fn, outcomes):
+    def call():
+        try:
+            outcomes[work_class] = scheduler.run(work_class, fn)
+        except Exception as e:
+            outcomes[work_class] = e
+    thread = threading.Thread(target=call)
+    thread.start()
+    return thread
+
+def recording_job(log, name, result=None):
+    def job():
+        log.append(name)
+        return result
+    return job
+
+def test_runs_most_urgent_class_first():
+    scheduler, metrics = start_scheduler()
+    release, blocker = occupy_worker(scheduler)
+
+    order = []
+    outcomes = {}
+    threads = []
+    for work_class in ('scene', 'landmark', 'obstacle'):
+        threads.append(submit(scheduler, work_class, recording_job(order, work_class, work_class), outcomes))
+        # One at a time, so the queue order is the submission order.
+        wait_for_queue_depth(metrics, len(threads))
+
+    release.set()
+    for thread in threads + [blocker]:
+        thread.join(5.0)
+    assert order == ['obstacle', 'landmark', 'scene']
+    assert outcomes == {'obstacle': 'obstacle', 'landmark': 'landmark', 'scene': 'scene'}
+
+def test_sheds_jobs_past_their_deadline():
+    scheduler, metrics = start_scheduler()
+    release, blocker = occupy_worker(scheduler)
+
+    ran = []
+    outcomes = {}
+    obstacle = submit(scheduler, 'obstacle', recording_job(ran, 'obstacle'), outcomes)
+    landmark = submit(scheduler, 'landmark', recording_job(ran, 'landmark', 'kept'), outcomes)
+    wait_for_queue_depth(metrics, 2)
+
+    # Hold the worker past the obstacle deadline, but not the landmark one.
+    time.sleep(WORK_CLASSES['obstacle'][1] + 0.2)
+    release.set()
+    for thread in (obstacle, landmark, blocker):
+        thread.join(5.0)
+
+    assert isinstance(outcomes['obstacle'], DeadlineExceeded)
+    assert outcomes['landmark'] == 'kept'
+    assert ran == ['landmark']
+    assert metric_value(metrics, 'va_shed_total{work_class="obstacle"}') == 1
+
+def test_job_errors_reach_the_caller():
+    scheduler, _ = start_scheduler()
+    def fail():
+        raise ValueError("bad frame")
+    try:
+        scheduler.run('obstacle', fail)
+    except ValueError as e:
+        assert str(e) == "bad frame"
+    else:
+        raise AssertionError("the job's error was not raised")
+
+if __name__ == '__main__':
+    test_runs_most_urgent_class_first()
+    test_sheds_jobs_past_their_deadline()
+    test_job_errors_reach_the_caller()
+    print("--- Scheduler orders and sheds jobs as expected ---")
@@ -1,5 +1,10 @@
+import argparse
+import hashlib
+import json
+import numpy as np
 import tensorflow as tf
 import os
+import time
 
 # --- Configuration ---
 # This section contains all the settings you might want to tweak.
@@ -19,46 +24,33 @@ SAVED_MODEL_NAME = 'landmark_recognizer.keras'
 TFLITE_MODEL_NAME = 'model.tflite'
 LABELS_FILE_NAME = 'labels.txt'
 
-# --- Main Training Script ---
-
-def main():
-    print(f"--- Starting Model Training ---")
-    print(f"TensorFlow Version: {tf.__version__}")
+# 4. Embedding Cache (used by --cached)
+# The frozen backbone's pooled output for every image is stored here, keyed by
+# the image's content hash, so only new images ever go through the backbone.
+EMBEDDING_CACHE_DIR = 'embedding_cache'
+EMBEDDINGS_FILE_NAME = 'embeddings.npy'
+EMBEDDING_INDEX_FILE_NAME = 'index.json'
+HEAD_EPOCHS = 50 # Training only the head on cached features is cheap.
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif')
 
-    # 1. Load the dataset from the folder structure
-    # TensorFlow can automatically infer the classes (labels) from the subfolder names.
-    print(f"Loading training data from: '{DATASET_PATH}'")
-    
-    # Create a dataset for training (80% of the images)
-    train_dataset = tf.keras.utils.image_dataset_from_directory(
-        DATASET_PATH,
-        validation_split=0.2, # Reserve 20% of images for validation
-        subset="training",
-        seed=123,
-        image_size=(IMG_HEIGHT, IMG_WIDTH),
-        batch_size=BATCH_SIZE
-    )
+# 5. Quantization (used by --quantize int8/uint8)
+# Images drawn from the dataset to calibrate the integer ranges.
+REPRESENTATIVE_SAMPLES = 200
+# The float (dynamic-range) model kept next to the integer one for comparison.
+FLOAT_TFLITE_MODEL_NAME = 'model_float.tflite'
+# Sidecar describing the model input, read by LandmarkRecognizer.
+MODEL_INFO_FILE_NAME = 'model.json'
+QUANTIZATION_REPORT_FILE_NAME = 'quantization_report.json'
 
-    # Create a dataset for validation (the 20% we reserved)
-    validation_dataset = tf.keras.utils.image_dataset_from_directory(
-        DATASET_PATH,
-        validation_split=0.2,
-        subset="validation",
-        seed=123,
-        image_size=(IMG_HEIGHT, IMG_WIDTH),
-        batch_size=BATCH_SIZE
-    )
+# 6. Embedding Backbone (used by --export-backbone)
+# Feature extractor for the nearest-neighbour recognizer (modules/landmark_matcher.py).
+BACKBONE_TFLITE_MODEL_NAME = 'backbone.tflite'
+BACKBONE_INFO_FILE_NAME = 'backbone.json'
 
-    # Get the class names from the dataset folders (e.g., ['entrance', 'library'])
-    class_names = train_dataset.class_names
-    print(f"Found classes: {class_names}")
+# --- Model Building Blocks ---
 
-    # Configure the dataset for performance
-    AUTOTUNE = tf.data.AUTOTUNE
-    train_dataset = train_dataset.cache().shuffle(1000).prefetch(buffer_size=AUTOTUNE)
-    validation_dataset = validation_dataset.cache().prefetch(buffer_size=AUTOTUNE)
-    
-    # 2. Build the model architecture
+def build_base_model():
+    """Creates the frozen, pre-trained MobileNetV2 backbone."""
     # We use a pre-trained model (MobileNetV2) as a base for faster and better results.
     base_model = tf.keras.applications.MobileNetV2(
         input_shape=(IMG_HEIGHT, IMG_WIDTH, 3),
@@ -66,8 +58,12 @@ def main():
         weights='imagenet' # Use weights pre-trained on the ImageNet dataset
     )
     base_model.trainable = False # Freeze the base model layers
+    return base_model
 
+def build_model(base_model, num_classes):
+    """Stacks the classification head on top of the backbone."""
     model = tf.keras.Sequential([
+        tf.keras.Input(shape=(IMG_HEIGHT, IMG_WIDTH, 3)),
         # Add a layer to automatically normalize pixel values
         tf.keras.layers.Rescaling(1./255),
         # The pre-trained base model
@@ -77,8 +73,152 @@ def main():
         # A dropout layer to prevent overfitting
         tf.keras.layers.Dropout(0.2),
         # The final decision layer with one output neuron for each class
-        tf.keras.layers.Dense(len(class_names), activation='softmax')
+        tf.keras.layers.Dense(num_classes, activation='softmax')
     ])
+    return model
+
+def representative_dataset():
+    """Yields single dataset images for calibrating full-integer quantization."""
+    _, images = list_dataset_images()
+    rng = np.random.default_rng(123)
+    picks = rng.choice(len(images), size=min(REPRESENTATIVE_SAMPLES, len(images)), replace=False)
+    for i in picks:
+        yield [tf.expand_dims(load_image(images[i][0]), 0)]
+
+def convert_model(model, quantize):
+    """Converts the Keras model to TFLite. `quantize` is 'dynamic', 'int8' or 'uint8'."""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT] # This enables quantization
+    if quantize in ('int8', 'uint8'):
+        # Full-integer: weights, activations and the input/output tensors are all integers.
+        integer_type = tf.int8 if quantize == 'int8' else tf.uint8
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = integer_type
+        converter.inference_output_type = integer_type
+    return converter.convert()
+
+def write_model_info(tflite_model, path):
+    """Records the input tensor's dtype and quantization params in a JSON sidecar."""
+    interpreter = tf.lite.Interpreter(model_content=tflite_model)
+    input_details = interpreter.get_input_details()[0]
+    scale, zero_point = input_details['quantization']
+    info = {
+        'input_dtype': np.dtype(input_details['dtype']).name,
+        'input_scale': float(scale),
+        'input_zero_point': int(zero_point),
+        # The model includes its own Rescaling layer, so it expects raw 0-255 pixels.
+        'pixel_range': [0, 255],
+    }
+    with open(path, 'w') as f:
+        json.dump(info, f, indent=2)
+
+def evaluate_tflite(tflite_model, samples):
+    """Returns (accuracy, mean latency in ms) of a TFLite model on (path, label) samples."""
+    interpreter = tf.lite.Interpreter(model_content=tflite_model, num_threads=1)
+    interpreter.allocate_tensors()
+    input_details = interpreter.get_input_details()[0]
+    output_details = interpreter.get_output_details()[0]
+    scale, zero_point = input_details['quantization']
+
+    correct = 0
+    latencies = []
+    for path, label in samples:
+        pixels = load_image(path).numpy()
+        if np.issubdtype(input_details['dtype'], np.integer):
+            limits = np.iinfo(input_details['dtype'])
+            pixels = np.clip(np.round(pixels / scale + zero_point), limits.min, limits.max)
+        input_data = np.expand_dims(pixels.astype(input_details['dtype']), axis=0)
+
+        start = time.perf_counter()
+        interpreter.set_tensor(input_details['index'], input_data)
+        interpreter.invoke()
+        scores = interpreter.get_tensor(output_details['index'])[0]
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        correct += int(np.argmax(scores) == label)
+    return correct / max(len(samples), 1), float(np.mean(latencies)) if latencies else 0.0
+
+def write_quantization_report(float_model, int_model, quantize):
+    """Compares accuracy, latency and size of the float and integer models."""
+    _, images = list_dataset_images()
+    # The validation split both training paths validated on.
+    _, samples = split_dataset_images(images)
+
+    report = {}
+    for name, tflite_model in (('float', float_model), (quantize, int_model)):
+        accuracy, latency_ms = evaluate_tflite(tflite_model, samples)
+        report[name] = {
+            'accuracy': accuracy,
+            'mean_latency_ms': latency_ms,
+            'size_bytes': len(tflite_model),
+        }
+        print(f"  {name:>6}: accuracy {accuracy:.3f}, {latency_ms:.1f} ms/image, {len(tflite_model) / 1e6:.2f} MB")
+    report['validation_images'] = len(samples)
+
+    with open(QUANTIZATION_REPORT_FILE_NAME, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved comparison report to: {QUANTIZATION_REPORT_FILE_NAME}")
+
+def export_model(model, class_names, quantize='dynamic'):
+    """Saves the Keras model, the TFLite model, its sidecar and the labels file."""
+    # Save the trained Keras model
+    print(f"Saving Keras model to: {SAVED_MODEL_NAME}")
+    model.save(SAVED_MODEL_NAME)
+    
+    # Convert the model to TensorFlow Lite (Quantized)
+    print(f"\n--- Converting to TensorFlow Lite ---")
+    tflite_model = convert_model(model, 'dynamic')
+
+    if quantize in ('int8', 'uint8'):
+        print(f"--- Converting to full-integer ({quantize}) TensorFlow Lite ---")
+        float_model = tflite_model
+        tflite_model = convert_model(model, quantize)
+        with open(FLOAT_TFLITE_MODEL_NAME, 'wb') as f:
+            f.write(float_model)
+        print(f"Saved float model for comparison to: {FLOAT_TFLITE_MODEL_NAME}")
+        write_quantization_report(float_model, tflite_model, quantize)
+    
+    # Save the TFLite model to a file
+    with open(TFLITE_MODEL_NAME, 'wb') as f:
+        f.write(tflite_model)
+    print(f"Successfully saved TFLite model to: {TFLITE_MODEL_NAME}")
+    write_model_info(tflite_model, MODEL_INFO_FILE_NAME)
+    print(f"Saved input description to: {MODEL_INFO_FILE_NAME}")
+        
+    # Create the labels file
+    print(f"Saving labels to: {LABELS_FILE_NAME}")
+    with open(LABELS_FILE_NAME, 'w') as f:
+        for item in class_names:
+            f.write(f"{item}\n")
+
+def export_backbone():
+    """Exports the frozen feature extractor on its own, for enrolment-based recognition."""
+    print("\n--- Exporting embedding backbone ---")
+    feature_extractor = build_feature_extractor(build_base_model())
+    tflite_model = convert_model(feature_extractor, 'dynamic')
+    with open(BACKBONE_TFLITE_MODEL_NAME, 'wb') as f:
+        f.write(tflite_model)
+    write_model_info(tflite_model, BACKBONE_INFO_FILE_NAME)
+    print(f"Successfully saved backbone to: {BACKBONE_TFLITE_MODEL_NAME}")
+
+# --- Full Training (images through the backbone on every epoch) ---
+
+def train_end_to_end():
+    # 1. Load the dataset from the folder structure
+    # The classes (labels) are the subfolder names.
+    print(f"Loading training data from: '{DATASET_PATH}'")
+    class_names, images = list_dataset_images()
+    print(f"Found classes: {class_names}")
+
+    # Reserve about 20% of the images for validation, using the same split as
+    # --cached training and the quantization report.
+    train_images, validation_images = split_dataset_images(images)
+    train_dataset = make_dataset(train_images, shuffle=True)
+    validation_dataset = make_dataset(validation_images)
+    
+    # 2. Build the model architecture
+    model = build_model(build_base_model(), len(class_names))
     
     # 3. Compile the model
     # This prepares the model for training by setting the optimizer, loss function, and metrics.
@@ -100,27 +240,199 @@ def main():
     )
     
     print("\n--- Training Complete ---")
-    
-    # 5. Save the trained Keras model
-    print(f"Saving Keras model to: {SAVED_MODEL_NAME}")
-    model.save(SAVED_MODEL_NAME)
-    
-    # 6. Convert the model to TensorFlow Lite (Quantized)
-    print(f"\n--- Converting to TensorFlow Lite ---")
-    converter = tf.lite.TFLiteConverter.from_keras_model(model)
-    converter.optimizations = [tf.lite.Optimize.DEFAULT] # This enables quantization
-    tflite_model = converter.convert()
-    
-    # Save the TFLite model to a file
-    with open(TFLITE_MODEL_NAME, 'wb') as f:
-        f.write(tflite_model)
-    print(f"Successfully saved TFLite model to: {TFLITE_MODEL_NAME}")
-        
-    # 7. Create the labels file
-    print(f"Saving labels to: {LABELS_FILE_NAME}")
-    with open(LABELS_FILE_NAME, 'w') as f:
-        for item in class_names:
-            f.write(f"{item}\n")
+    return model, class_names
+
+# --- Cached Training (backbone runs once per image, only the head trains) ---
+
+def list_dataset_images():
+    """Returns (class_names, [(image_path, class_index), ...]) in a stable order."""
+    class_names = sorted(
+        d for d in os.listdir(DATASET_PATH) if os.path.isdir(os.path.join(DATASET_PATH, d))
+    )
+    images = []
+    for class_index, class_name in enumerate(class_names):
+        class_dir = os.path.join(DATASET_PATH, class_name)
+        for filename in sorted(os.listdir(class_dir)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                images.append((os.path.join(class_dir, filename), class_index))
+    return class_names, images
+
+def image_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def is_validation_hash(digest):
+    """About 20% of images, chosen by content so an image never changes sides as the dataset grows."""
+    return int(digest[:8], 16) % 5 == 0
+
+def split_dataset_images(images):
+    """Splits (path, label) pairs into (training, validation) lists by content hash."""
+    train, validation = [], []
+    for path, label in images:
+        (validation if is_validation_hash(image_hash(path)) else train).append((path, label))
+    return train, validation
+
+def load_image(path):
+    """Loads and resizes one image the same way image_dataset_from_directory does."""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image.set_shape([None, None, 3])
+    return tf.image.resize(image, (IMG_HEIGHT, IMG_WIDTH))
+
+def make_dataset(samples, shuffle=False):
+    """Batched, cached (image, label) dataset from (path, label) pairs."""
+    AUTOTUNE = tf.data.AUTOTUNE
+    paths = [path for path, _ in samples]
+    labels = [label for _, label in samples]
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    dataset = dataset.map(lambda path, label: (load_image(path), label), num_parallel_calls=AUTOTUNE).cache()
+    if shuffle:
+        # After the cache, so every epoch sees a new order.
+        dataset = dataset.shuffle(max(len(samples), 1), seed=123)
+    return dataset.batch(BATCH_SIZE).prefetch(buffer_size=AUTOTUNE)
+
+def build_feature_extractor(base_model):
+    """The frozen part of the model: pixels in, pooled embedding out."""
+    return tf.keras.Sequential([
+        tf.keras.Input(shape=(IMG_HEIGHT, IMG_WIDTH, 3)),
+        tf.keras.layers.Rescaling(1./255),
+        base_model,
+        tf.keras.layers.GlobalAveragePooling2D(),
+    ])
+
+def embedding_cache_key(base_model):
+    """What the cached embeddings depend on; a cache made with anything else is rebuilt."""
+    return {'backbone': base_model.name, 'input_size': [IMG_HEIGHT, IMG_WIDTH]}
+
+def update_embedding_cache(paths, feature_extractor, cache_key):
+    """
+    Makes sure every image in `paths` has an embedding in the cache, and drops the
+    rows of images that are no longer in the dataset.
+    Returns (embeddings memmap, hashes in the same order as `paths`, row of each hash).
+    """
+    os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+    embeddings_path = os.path.join(EMBEDDING_CACHE_DIR, EMBEDDINGS_FILE_NAME)
+    index_path = os.path.join(EMBEDDING_CACHE_DIR, EMBEDDING_INDEX_FILE_NAME)
+
+    index = {}
+    cached = None
+    if os.path.exists(index_path) and os.path.exists(embeddings_path):
+        with open(index_path, 'r') as f:
+            saved = json.load(f)
+        if isinstance(saved, dict) and saved.get('key') == cache_key:
+            index = saved['rows']
+            cached = np.load(embeddings_path, mmap_mode='r')
+        else:
+            print("Embedding cache was made with a different backbone or input size; rebuilding it.")
+
+    hashes = [image_hash(path) for path in paths]
+    missing = {}
+    for path, digest in zip(paths, hashes):
+        if digest not in index and digest not in missing:
+            missing[digest] = path
+    wanted = set(hashes)
+    kept = [digest for digest in index if digest in wanted]
+    stale = len(index) - len(kept)
+
+    print(f"Embedding cache: {len(hashes) - len(missing)} hits, {len(missing)} new images to embed, "
+          f"{stale} removed images to drop.")
+    if not missing and not stale:
+        return cached, hashes, [index[digest] for digest in hashes]
+
+    new_embeddings = None
+    if missing:
+        # Run only the new images through the backbone.
+        new_dataset = tf.data.Dataset.from_tensor_slices(list(missing.values())).map(
+            load_image, num_parallel_calls=tf.data.AUTOTUNE
+        ).batch(BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+        new_embeddings = feature_extractor.predict(new_dataset)
+
+    # Rewrite the cache file: the rows still in use, then the new ones.
+    width = cached.shape[1] if new_embeddings is None else new_embeddings.shape[1]
+    tmp_path = embeddings_path + '.tmp'
+    rebuilt = np.lib.format.open_memmap(
+        tmp_path, mode='w+', dtype=np.float32, shape=(len(kept) + len(missing), width)
+    )
+    if kept:
+        rebuilt[:len(kept)] = cached[[index[digest] for digest in kept]]
+    if new_embeddings is not None:
+        rebuilt[len(kept):] = new_embeddings
+    rebuilt.flush()
+    del rebuilt, cached
+    os.replace(tmp_path, embeddings_path)
+
+    index = {digest: row for row, digest in enumerate(kept + list(missing))}
+    with open(index_path, 'w') as f:
+        json.dump({'key': cache_key, 'rows': index}, f)
+
+    return np.load(embeddings_path, mmap_mode='r'), hashes, [index[digest] for digest in hashes]
+
+def train_from_cache():
+    print(f"Loading training data from: '{DATASET_PATH}'")
+    class_names, images = list_dataset_images()
+    print(f"Found classes: {class_names}")
+
+    base_model = build_base_model()
+    paths = [path for path, _ in images]
+    embeddings, hashes, rows = update_embedding_cache(
+        paths, build_feature_extractor(base_model), embedding_cache_key(base_model)
+    )
+    features = np.asarray(embeddings[rows])
+    labels = np.array([class_index for _, class_index in images])
+
+    # Split by content hash so an image stays on the same side as the dataset grows.
+    is_validation = np.array([is_validation_hash(digest) for digest in hashes])
+
+    head = tf.keras.Sequential([
+        tf.keras.Input(shape=(features.shape[1],)),
+        tf.keras.layers.Dropout(0.2),
+        tf.keras.layers.Dense(len(class_names), activation='softmax')
+    ])
+    head.compile(
+        optimizer='adam',
+        loss=tf.keras.losses.SparseCategoricalCrossentropy(),
+        metrics=['accuracy']
+    )
+
+    print(f"\n--- Training the head for {HEAD_EPOCHS} epochs on cached features ---")
+    head.fit(
+        features[~is_validation], labels[~is_validation],
+        validation_data=(features[is_validation], labels[is_validation]),
+        batch_size=BATCH_SIZE,
+        epochs=HEAD_EPOCHS,
+        shuffle=True
+    )
+    print("\n--- Training Complete ---")
+
+    # Put the trained head back on top of the backbone for export.
+    model = build_model(base_model, len(class_names))
+    model.layers[-1].set_weights(head.layers[-1].get_weights())
+    return model, class_names
+
+# --- Main Training Script ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the landmark recognition model.")
+    parser.add_argument('--cached', action='store_true',
+                        help="Embed each image once into a cache and train only the classification head.")
+    parser.add_argument('--quantize', choices=['dynamic', 'int8', 'uint8'], default='dynamic',
+                        help="'dynamic' keeps float input/output; 'int8'/'uint8' export a full-integer model.")
+    parser.add_argument('--export-backbone', action='store_true',
+                        help="Only export the embedding backbone for the nearest-neighbour recognizer.")
+    args = parser.parse_args()
+
+    if args.export_backbone:
+        export_backbone()
+        return
+
+    print(f"--- Starting Model Training ---")
+    print(f"TensorFlow Version: {tf.__version__}")
+
+    if args.cached:
+        model, class_names = train_from_cache()
+    else:
+        model, class_names = train_end_to_end()
+
+    export_model(model, class_names, quantize=args.quantize)
     print("--- All Done! ---")
 
 